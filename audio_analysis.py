@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Vectorized audio analytics for the word-list outputs
+Decodes each provider's MP3 to PCM once (pydub/ffmpeg), then uses NumPy to
+compute frame loudness, split the audio into per-word spans at the pauses
+between words, and flag words whose duration, loudness or clipping looks off -
+usually a mispronunciation or a skipped word
+"""
+
+import os
+import sys
+import json
+import argparse
+
+import numpy as np
+from pydub import AudioSegment
+
+DEFAULT_FILES = {
+    "elevenlabs": "elevenlabs_all_words.mp3",
+    "rime": "rime_all_words_full.mp3",
+}
+
+FRAME_MS = 20
+HOP_MS = 10
+# Frames this far below the loudest frame count as silence; tighter levels are tried in
+# turn for voices that barely pause between words
+SILENCE_LEVELS_DB = (35, 30, 25, 20, 15, 10)
+MIN_PAUSE_MS = 50            # Shorter dips are treated as part of the word
+MIN_WORD_MS = 60             # Shorter voiced blips are dropped
+CLIP_LEVEL = 0.999           # |sample| at or above this is clipped
+DURATION_Z_LIMIT = 3.0       # Robust z-score beyond which a word's duration is flagged
+# Word durations should track word length; below this correlation the boundaries are
+# probably wrong and duration flags would be noise
+MIN_SEGMENTATION_R = 0.3
+
+def decode_pcm(path):
+    """Decode an MP3 file to mono float32 samples in [-1, 1], returning (samples, sample_rate)"""
+    # Naming the codec skips pydub's separate ffprobe pass, so each file is read by ffmpeg once
+    segment = AudioSegment.from_file(path, format="mp3", codec="mp3")
+    samples = np.array(segment.get_array_of_samples(), dtype=np.float32)
+    if segment.channels > 1:
+        samples = samples.reshape(-1, segment.channels).mean(axis=1)
+    samples /= float(1 << (8 * segment.sample_width - 1))
+    return samples, segment.frame_rate
+
+def frame_rms_db(samples, sample_rate, frame_ms=FRAME_MS, hop_ms=HOP_MS):
+    """RMS loudness in dBFS for overlapping frames, one value per hop"""
+    frame = max(int(sample_rate * frame_ms / 1000), 1)
+    hop = max(int(sample_rate * hop_ms / 1000), 1)
+    if len(samples) < frame:
+        samples = np.pad(samples, (0, frame - len(samples)))
+    windows = np.lib.stride_tricks.sliding_window_view(samples, frame)[::hop]
+    rms = np.sqrt(np.mean(np.square(windows), axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-10))
+
+def voiced_spans(db, hop_ms=HOP_MS, silence_below_peak_db=SILENCE_LEVELS_DB[0],
+                 min_pause_ms=MIN_PAUSE_MS, min_word_ms=MIN_WORD_MS):
+    """Frame index (start, end) pairs of voiced runs, with short pauses bridged"""
+    voiced = db > db.max() - silence_below_peak_db
+    edges = np.diff(np.concatenate(([0], voiced.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    if not len(starts):
+        return np.empty((0, 2), dtype=int)
+
+    # Bridge pauses too short to be a gap between words
+    keep = (starts[1:] - ends[:-1]) * hop_ms >= min_pause_ms
+    starts = np.concatenate((starts[:1], starts[1:][keep]))
+    ends = np.concatenate((ends[:-1][keep], ends[-1:]))
+
+    long_enough = (ends - starts) * hop_ms >= min_word_ms
+    return np.column_stack((starts[long_enough], ends[long_enough]))
+
+def find_spans(db, word_count, hop_ms=HOP_MS):
+    """Voiced spans at the loosest silence level that still yields one span per word
+
+    Returns (spans, silence level in dB below peak).
+    """
+    for level in SILENCE_LEVELS_DB:
+        spans = voiced_spans(db, hop_ms, level)
+        if len(spans) >= word_count:
+            break
+    return spans, level
+
+def split_into_words(spans, word_count):
+    """Group voiced spans into word_count words by cutting at the widest pauses
+
+    Returns (start, end) frame pairs, or None if there are fewer spans than
+    words (a word was skipped or two were run together).
+    """
+    if len(spans) < word_count or word_count == 0:
+        return None
+    gaps = spans[1:, 0] - spans[:-1, 1]
+    cuts = np.sort(np.argsort(gaps, kind="stable")[::-1][:word_count - 1])
+    first = np.concatenate(([0], cuts + 1))
+    last = np.concatenate((cuts, [len(spans) - 1]))
+    return np.column_stack((spans[first, 0], spans[last, 1]))
+
+def robust_z(values):
+    """Median/MAD z-scores, so a few bad words don't hide themselves"""
+    median = np.median(values)
+    mad = np.median(np.abs(values - median)) * 1.4826
+    if mad == 0:
+        return np.zeros_like(values)
+    return (values - median) / mad
+
+def analyze_file(path, words, hop_ms=HOP_MS):
+    """Analyze one provider's word-list audio against the expected word order"""
+    samples, sample_rate = decode_pcm(path)
+    db = frame_rms_db(samples, sample_rate, hop_ms=hop_ms)
+    spans, silence_level = find_spans(db, len(words), hop_ms)
+    hop = max(int(sample_rate * hop_ms / 1000), 1)
+
+    duration = len(samples) / sample_rate
+    voiced_seconds = float(np.sum(spans[:, 1] - spans[:, 0]) * hop_ms / 1000) if len(spans) else 0.0
+    clipped = np.abs(samples) >= CLIP_LEVEL
+    letters = sum(len(word.replace(" ", "")) for word in words)
+
+    result = {
+        "file": path,
+        "duration": round(duration, 3),
+        "voiced_seconds": round(voiced_seconds, 3),
+        "loudness_dbfs": round(float(np.percentile(db, 95)), 1),
+        "clipped_samples": int(np.count_nonzero(clipped)),
+        "spans": int(len(spans)),
+        "silence_below_peak_db": silence_level,
+        "words_per_minute": round(len(words) / voiced_seconds * 60, 1) if voiced_seconds else 0.0,
+        "chars_per_second": round(letters / voiced_seconds, 1) if voiced_seconds else 0.0,
+        "words": [],
+        "flagged": [],
+    }
+
+    word_frames = split_into_words(spans, len(words))
+    if word_frames is None:
+        result["error"] = f"can't segment into words (found {len(spans)} voiced spans for {len(words)} words)"
+        return result
+
+    seconds = (word_frames[:, 1] - word_frames[:, 0]) * hop_ms / 1000
+    lengths = np.array([max(len(word.replace(" ", "")), 1) for word in words], dtype=np.float64)
+    # Compare time per letter so long names aren't flagged just for being long
+    z = robust_z(np.log(seconds / lengths))
+
+    segmentation_r = float(np.corrcoef(lengths, seconds)[0, 1]) if len(words) > 2 else 1.0
+    reliable = bool(np.isfinite(segmentation_r) and segmentation_r >= MIN_SEGMENTATION_R)
+    result["segmentation_r"] = round(segmentation_r, 2)
+    if not reliable:
+        result["error"] = (f"word boundaries unreliable (duration/length r={segmentation_r:.2f}), "
+                           f"duration flags skipped")
+
+    # Per-word loudness and clipping from the same decoded samples
+    cumulative_clips = np.concatenate(([0], np.cumsum(clipped)))
+    sample_bounds = np.minimum(word_frames * hop, len(samples))
+    clip_counts = cumulative_clips[sample_bounds[:, 1]] - cumulative_clips[sample_bounds[:, 0]]
+    peak_db = np.array([db[start:end].max() for start, end in word_frames])
+
+    for i, word in enumerate(words):
+        reasons = []
+        if reliable and z[i] > DURATION_Z_LIMIT:
+            reasons.append("long")
+        elif reliable and z[i] < -DURATION_Z_LIMIT:
+            reasons.append("short")
+        if clip_counts[i]:
+            reasons.append("clipped")
+        entry = {
+            "word": word,
+            "start": round(float(word_frames[i, 0] * hop_ms / 1000), 3),
+            "duration": round(float(seconds[i]), 3),
+            "duration_z": round(float(z[i]), 2),
+            "peak_dbfs": round(float(peak_db[i]), 1),
+            "clipped_samples": int(clip_counts[i]),
+            "flags": reasons,
+        }
+        result["words"].append(entry)
+        if reasons:
+            result["flagged"].append(entry)
+    return result
+
+def print_report(results):
+    """Print provider summaries and flagged words"""
+    print("\n📊 AUDIO ANALYSIS")
+    print("=" * 78)
+    print(f"{'Provider':<11} {'Length':>8} {'Voiced':>8} {'Spans':>6} {'WPM':>6} "
+          f"{'Chars/s':>8} {'Loud dBFS':>10} {'Clipped':>8}")
+    for provider, result in results.items():
+        print(f"{provider:<11} {result['duration']:>7.2f}s {result['voiced_seconds']:>7.2f}s "
+              f"{result['spans']:>6} {result['words_per_minute']:>6.1f} {result['chars_per_second']:>8.1f} "
+              f"{result['loudness_dbfs']:>10.1f} {result['clipped_samples']:>8}")
+
+    for provider, result in results.items():
+        if "error" in result:
+            print(f"\n⚠️ {provider}: {result['error']}")
+            if not result["flagged"]:
+                continue
+        if not result["flagged"]:
+            print(f"\n✅ {provider}: no words flagged")
+            continue
+        print(f"\n🚩 {provider}: {len(result['flagged'])} words flagged")
+        for entry in result["flagged"]:
+            print(f"   {entry['word']:<22} {entry['duration']:5.2f}s (z={entry['duration_z']:+.1f}) "
+                  f"at {entry['start']:6.2f}s  {', '.join(entry['flags'])}")
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Segment word-list audio into words and flag anomalies")
+    parser.add_argument("--providers", nargs="+", default=list(DEFAULT_FILES), choices=list(DEFAULT_FILES))
+    parser.add_argument("--words", default="test_words.txt", help="Word list in spoken order")
+    parser.add_argument("--file", action="append", default=[], metavar="PROVIDER=PATH",
+                        help="Analyze PATH instead of the provider's default output")
+    parser.add_argument("--json", metavar="PATH", help="Also write per-word results as JSON")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    # Change to script directory
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    os.chdir(script_dir)
+
+    from rime_full import load_test_words
+    words = load_test_words(args.words)
+
+    files = dict(DEFAULT_FILES)
+    for option in args.file:
+        provider, _, path = option.partition("=")
+        files[provider] = path
+
+    results = {}
+    for provider in args.providers:
+        path = files[provider]
+        if not os.path.exists(path):
+            print(f"❌ {path} not found; generate it first")
+            continue
+        print(f"🔍 Analyzing {path}...")
+        try:
+            results[provider] = analyze_file(path, words)
+        except Exception as e:
+            print(f"❌ Could not decode {path}: {e}")
+
+    if not results:
+        return False
+
+    print_report(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Results written to {args.json}")
+    return True
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
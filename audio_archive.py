@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Packed audio archive with a per-utterance index
+Stores many short clips (one per word/sentence per provider) back to back in a
+single data file, with a compact binary index of offsets keyed by provider,
+text and settings. Clips are served as zero-copy slices of an mmap, so any one
+can be extracted or played in O(1) without re-decoding whole files.
+
+Usage:
+    python audio_archive.py build --providers rime elevenlabs
+    python audio_archive.py list
+    python audio_archive.py extract rime "Quinoa" -o quinoa.mp3
+    python audio_archive.py play "Quinoa"
+"""
+
+import os
+import re
+import sys
+import mmap
+import struct
+import argparse
+import tempfile
+import threading
+import subprocess
+import binascii
+
+from mp3_concat import mp3_duration
+
+DEFAULT_ARCHIVE = "audio_archive.tsa"
+INDEX_SUFFIX = ".idx"
+INDEX_MAGIC = b"TSAIDX1\n"
+
+# digest, offset, length, provider length, text length (then provider & text as UTF-8)
+RECORD = struct.Struct("<32sQIBH")
+
+class ArchiveEntry:
+    """Location and label of one clip in the data file"""
+
+    __slots__ = ("key", "offset", "length", "provider", "text")
+
+    def __init__(self, key, offset, length, provider, text):
+        self.key = key
+        self.offset = offset
+        self.length = length
+        self.provider = provider
+        self.text = text
+
+class AudioArchive:
+    """Append-only data file of MP3 segments plus an offset/length index
+
+    Keys are the same hex digests the audio cache uses (client.cache_key),
+    so they cover provider, voice, model, text and settings. Adding a key
+    again points the index at the new segment; the old bytes stay in the
+    data file until the archive is rebuilt.
+    """
+
+    def __init__(self, path=DEFAULT_ARCHIVE, writable=False):
+        self.path = path
+        self.index_path = path + INDEX_SUFFIX
+        self.writable = writable
+        self.entries = {}      # key -> ArchiveEntry
+        self.by_label = {}     # (provider or sweep label, text) -> key of the latest clip
+        self._lock = threading.Lock()
+        self._map = None
+        self._mapped_size = 0
+
+        if writable:
+            open(self.path, 'ab').close()
+            if not os.path.exists(self.index_path):
+                with open(self.index_path, 'wb') as f:
+                    f.write(INDEX_MAGIC)
+        self._data = open(self.path, 'r+b' if writable else 'rb')
+        self._load_index()
+
+    def _load_index(self):
+        with open(self.index_path, 'rb') as f:
+            if f.read(len(INDEX_MAGIC)) != INDEX_MAGIC:
+                raise ValueError(f"{self.index_path} is not an audio archive index")
+            data = f.read()
+
+        position = 0
+        while position + RECORD.size <= len(data):
+            digest, offset, length, provider_length, text_length = RECORD.unpack_from(data, position)
+            end = position + RECORD.size + provider_length + text_length
+            if end > len(data):
+                break  # Partially written record from an interrupted run
+            provider = data[position + RECORD.size:position + RECORD.size + provider_length].decode("utf-8")
+            text = data[position + RECORD.size + provider_length:end].decode("utf-8")
+            self._index(ArchiveEntry(digest.hex(), offset, length, provider, text))
+            position = end
+
+    def _index(self, entry):
+        self.entries[entry.key] = entry
+        self.by_label[(entry.provider, entry.text)] = entry.key
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def add(self, key, audio_bytes, provider="", text=""):
+        """Append a clip and index it under key"""
+        if not self.writable:
+            raise ValueError("Archive was opened read-only")
+
+        with self._lock:
+            self._data.seek(0, os.SEEK_END)
+            offset = self._data.tell()
+            self._data.write(audio_bytes)
+            # Data is flushed before its index record so the index never points past the data
+            self._data.flush()
+            self._append_record(key, offset, len(audio_bytes), provider, text)
+
+    def label(self, key, provider, text):
+        """Index an archived clip under another provider/label & text without copying its audio"""
+        if not self.writable:
+            raise ValueError("Archive was opened read-only")
+        entry = self.entries[key]
+        if self.by_label.get((provider, text)) == key:
+            return
+        with self._lock:
+            self._append_record(key, entry.offset, entry.length, provider, text)
+
+    def _append_record(self, key, offset, length, provider, text):
+        provider_bytes = provider.encode("utf-8")[:255]
+        text_bytes = text.encode("utf-8")[:65535]
+        record = RECORD.pack(binascii.unhexlify(key), offset, length, len(provider_bytes), len(text_bytes))
+        with open(self.index_path, 'ab') as f:
+            f.write(record + provider_bytes + text_bytes)
+        self._index(ArchiveEntry(key, offset, length, provider, text))
+
+    def _mapping(self, end):
+        """mmap of the data file covering at least `end` bytes, remapped after appends"""
+        if self._map is None or end > self._mapped_size:
+            if self._map is not None:
+                self._map.close()
+            self._mapped_size = os.fstat(self._data.fileno()).st_size
+            self._map = mmap.mmap(self._data.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map
+
+    def get(self, key):
+        """Return a zero-copy memoryview of key's clip, or None if it isn't archived"""
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        with self._lock:
+            mapping = self._mapping(entry.offset + entry.length)
+        return memoryview(mapping)[entry.offset:entry.offset + entry.length]
+
+    def find(self, provider, text):
+        """Key of the latest clip archived for provider & text, or None"""
+        return self.by_label.get((provider, text))
+
+    def extract(self, key, output_file):
+        """Write key's clip to output_file, returning False if it isn't archived"""
+        clip = self.get(key)
+        if clip is None:
+            return False
+        with open(output_file, 'wb') as f:
+            f.write(clip)
+        return True
+
+    def close(self):
+        # Outstanding memoryviews keep the mapping alive; it's released when they are
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                pass
+            self._map = None
+        self._data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def archive_clips(archive, providers, texts, scheduler):
+    """Synthesize each text separately with every provider and add any missing clips
+
+    All providers' jobs go into one JobScheduler queue, so every provider is
+    kept busy at once. Returns the number of clips that could not be synthesized.
+    """
+    from tts_client import get_client, get_api_key
+
+    jobs = []
+    for provider in providers:
+        client = get_client(provider, get_api_key(provider))
+        for text in texts:
+            # Clips already archived are skipped before they reach the queue
+            if client.cache_key(client.build_payload(text)) not in archive:
+                jobs.append(scheduler.submit(provider, text))
+
+    failed = {provider: 0 for provider in providers}
+    added = {provider: 0 for provider in providers}
+    for job in jobs:
+        audio_bytes = job.result()
+        if audio_bytes is None:
+            failed[job.provider] += 1
+            continue
+        archive.add(job.key, audio_bytes, job.provider, job.text)
+        added[job.provider] += 1
+
+    for provider in providers:
+        print(f"📦 {provider}: {added[provider]} clips added, {failed[provider]} failed")
+    print(f"📦 {len(archive)} clips in archive")
+    return sum(failed.values())
+
+def play_clip(clip):
+    """Play MP3 bytes with afplay (macOS) or ffplay, returning False if neither is available"""
+    with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as f:
+        f.write(clip)
+        path = f.name
+    try:
+        for command in (["afplay", path], ["ffplay", "-nodisp", "-autoexit", "-loglevel", "quiet", path]):
+            try:
+                subprocess.run(command, check=False)
+                return True
+            except FileNotFoundError:
+                continue
+        return False
+    finally:
+        os.remove(path)
+
+def default_output_name(label, text):
+    """File name for an extracted clip, e.g. "rime_cove_mistv2_Quinoa.mp3" for a sweep label
+
+    Slashes and other characters that aren't safe in a file name become underscores.
+    """
+    return re.sub(r"[^\w.=,-]+", "_", f"{label}_{text}").strip("._") + ".mp3"
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Build and read the packed per-word audio archive")
+    parser.add_argument("--archive", default=DEFAULT_ARCHIVE, help="Archive data file")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="Synthesize each test word separately into the archive")
+    build.add_argument("--providers", nargs="+", default=["rime", "elevenlabs"], choices=["rime", "elevenlabs"])
+    build.add_argument("--words", default="test_words.txt", help="Word list to archive")
+    build.add_argument("--sentences", action="store_true", help="Archive the test sentences too")
+    build.add_argument("--concurrency", type=int, default=None,
+                       help="Requests in flight across all providers (default: TTS_MAX_CONCURRENCY or 8)")
+    build.add_argument("--policy", choices=["sjf", "fair"], default=None,
+                       help="Run the shortest texts first (sjf) or share work evenly across providers (fair)")
+
+    commands.add_parser("list", help="List archived clips")
+
+    extract = commands.add_parser("extract", help="Write one clip to an MP3 file")
+    extract.add_argument("provider", help="Provider, or a sweep configuration label like rime/cove/mistv2")
+    extract.add_argument("text")
+    extract.add_argument("-o", "--output", help="Output file (default: <provider>_<text>.mp3)")
+
+    play = commands.add_parser("play", help="Play one text from every provider (or sweep configuration), back to back")
+    play.add_argument("text")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    # Change to script directory
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    os.chdir(script_dir)
+
+    if args.command == "build":
+        from rime_full import load_test_words
+
+        texts = load_test_words(args.words)
+        if args.sentences:
+            from sentence_test_script import get_test_sentences
+            texts += get_test_sentences()
+
+        from scheduler import DEFAULT_CONCURRENCY, JobScheduler, budgets_from_env
+        from tts_client import get_api_key
+
+        for provider in args.providers:
+            if not get_api_key(provider):
+                print(f"Error: {provider.upper()}_API_KEY not found in environment")
+                return False
+
+        scheduler = JobScheduler(args.concurrency or int(os.getenv('TTS_MAX_CONCURRENCY', DEFAULT_CONCURRENCY)),
+                                 budgets_from_env(args.providers),
+                                 args.policy or os.getenv('TTS_SCHEDULE_POLICY', "sjf"))
+        with AudioArchive(args.archive, writable=True) as archive, scheduler:
+            failed = archive_clips(archive, args.providers, texts, scheduler)
+        scheduler.print_stats()
+        size = os.path.getsize(args.archive) / 1024 / 1024
+        print(f"📁 {args.archive}: {size:.2f} MB")
+        return failed == 0
+
+    if not os.path.exists(args.archive):
+        print(f"❌ No archive at {args.archive}; run: python audio_archive.py build")
+        return False
+
+    with AudioArchive(args.archive) as archive:
+        if args.command == "list":
+            # A clip indexed under several labels (sweep configurations sharing audio) is listed under each
+            for (label, text), key in sorted(archive.by_label.items(), key=lambda item: (item[0][1], item[0][0])):
+                entry = archive.entries[key]
+                duration = mp3_duration(archive.get(key))
+                print(f"{label:<11} {duration:6.2f}s {entry.length:>8} bytes  {text}")
+            print(f"{len(archive)} clips")
+            return True
+
+        if args.command == "extract":
+            key = archive.find(args.provider, args.text)
+            output = args.output or default_output_name(args.provider, args.text)
+            if key is None or not archive.extract(key, output):
+                print(f"❌ No {args.provider} clip for '{args.text}'")
+                return False
+            print(f"✅ Extracted to {output}")
+            return True
+
+        if args.command == "play":
+            labels = sorted(label for label, text in archive.by_label if text == args.text)
+            for label in labels:
+                print(f"🔊 {label}: {args.text}")
+                if not play_clip(archive.get(archive.find(label, args.text))):
+                    print("❌ No audio player found (need afplay or ffplay)")
+                    return False
+            if not labels:
+                print(f"❌ No clips for '{args.text}'")
+            return bool(labels)
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
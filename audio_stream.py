@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Streaming decode of base64 audio inside JSON responses
+Finds the audioContent field in RIME's JSON body as it arrives and base64-decodes
+it chunk by chunk, so neither the JSON text nor the base64 string is ever held
+in memory whole
+"""
+
+import io
+import re
+import base64
+import binascii
+
+from instrumentation import span
+
+
+READ_CHUNK_SIZE = 64 * 1024
+
+class Base64FieldDecoder:
+    """Incremental decoder for one base64 string field of a JSON object
+
+    feed() takes raw body bytes and returns whatever audio bytes can be decoded
+    so far; finished is set once the field's closing quote has been seen.
+    """
+
+    def __init__(self, field="audioContent"):
+        self.key = re.compile(rb'"' + re.escape(field.encode("ascii")) + rb'"\s*:\s*"')
+        self.key_length = len(field) + 2
+        self.found = False
+        self.finished = False
+        self._buffer = b""   # Body bytes still being searched for the key
+        self._pending = b""  # Base64 characters not yet forming a full 4-byte group
+        self._escape = False
+
+    def feed(self, data):
+        if self.finished:
+            return b""
+
+        if not self.found:
+            self._buffer += data
+            match = self.key.search(self._buffer)
+            if not match:
+                # Keep enough of the tail to match a key (plus whitespace) split across reads
+                self._buffer = self._buffer[-(self.key_length + 64):]
+                return b""
+            self.found = True
+            data = self._buffer[match.end():]
+            self._buffer = b""
+
+        end = data.find(b'"')
+        if end != -1:
+            data = data[:end]
+            self.finished = True
+
+        self._pending += self._unescape(data)
+        usable = len(self._pending) // 4 * 4
+        if self.finished:
+            usable = len(self._pending)
+        chunk, self._pending = self._pending[:usable], self._pending[usable:]
+        return base64.b64decode(chunk, validate=True) if chunk else b""
+
+    def _unescape(self, data):
+        """Drop JSON escapes that can appear in base64 text (\\/ and line breaks)"""
+        if self._escape:
+            data = b"\\" + data
+            self._escape = False
+        if b"\\" not in data:
+            return data
+        if data.endswith(b"\\") and not data.endswith(b"\\\\"):
+            data = data[:-1]
+            self._escape = True
+        return data.replace(b"\\/", b"/").replace(b"\\n", b"").replace(b"\\r", b"")
+
+def decode_audio_content(chunks, sink, field="audioContent"):
+    """Decode the base64 field from an iterable of body chunks into sink
+
+    Returns the number of audio bytes written, or None if the field isn't in
+    the body. Raises ValueError if the body ends mid-field or isn't valid base64.
+    """
+    decoder = Base64FieldDecoder(field)
+    written = 0
+    for chunk in chunks:
+        try:
+            audio = decoder.feed(chunk)
+        except binascii.Error as e:
+            raise ValueError(f"Invalid base64 in {field}: {e}")
+        if audio:
+            sink.write(audio)
+            written += len(audio)
+        if decoder.finished:
+            break
+
+    if not decoder.found:
+        return None
+    if not decoder.finished:
+        raise ValueError(f"Response ended inside {field}")
+    return written
+
+def read_audio_content(response, field="audioContent"):
+    """Decode a streamed RIME response's audio, returning MP3 bytes or None if absent
+
+    Connection problems mid-body are raised as requests exceptions, and
+    malformed bodies as ValueError.
+    """
+    sink = io.BytesIO()
+    try:
+        # Covers both reading the body off the socket and decoding it
+        with span("decode_audio") as s:
+            written = decode_audio_content(response.iter_content(READ_CHUNK_SIZE), sink, field)
+            s.set(bytes=written or 0)
+    finally:
+        response.close()
+    if written is None:
+        return None
+    return sink.getvalue()
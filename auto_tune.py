@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Batch-size auto-tuning from observed request latency
+Records latency against character count during every run, refits each
+provider's cost curve at exit, and picks the chunk size that maximizes
+characters synthesized per second for the next run
+"""
+
+import os
+import json
+import atexit
+import threading
+
+from http_replay import http_mode
+from batch_packing import LatencyModel, load_latency_model, save_latency_model, DEFAULT_MODEL_FILE
+from text_splitter import PROVIDER_CHAR_LIMITS
+
+DEFAULT_SAMPLES_FILE = ".tts_latency_samples.json"
+MAX_SAMPLES_PER_PROVIDER = 500  # Keep a recent window so stale measurements roll off
+MIN_SAMPLES_TO_FIT = 5
+MIN_CHUNK_CHARS = 50
+
+class LatencyRecorder:
+    """Thread-safe collector of (chars, latency) samples per provider"""
+
+    def __init__(self, samples_file=DEFAULT_SAMPLES_FILE, model_file=DEFAULT_MODEL_FILE):
+        self.samples_file = samples_file
+        self.model_file = model_file
+        self.samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, provider, chars, latency):
+        with self._lock:
+            self.samples.setdefault(provider, []).append((chars, latency))
+
+    def save(self):
+        """Merge this run's samples into the samples file and refit each provider's model
+
+        Returns {provider: LatencyModel} for the providers that were refit.
+        """
+        with self._lock:
+            new_samples = {provider: list(samples) for provider, samples in self.samples.items()}
+            self.samples.clear()
+        if not new_samples:
+            return {}
+
+        stored = {}
+        if os.path.exists(self.samples_file):
+            try:
+                with open(self.samples_file, 'r') as f:
+                    stored = json.load(f)
+            except (OSError, ValueError):
+                stored = {}
+
+        fitted = {}
+        for provider, samples in new_samples.items():
+            merged = [tuple(sample) for sample in stored.get(provider, [])] + samples
+            merged = merged[-MAX_SAMPLES_PER_PROVIDER:]
+            stored[provider] = merged
+
+            if len(merged) >= MIN_SAMPLES_TO_FIT:
+                model = LatencyModel.fit(merged)
+                if model:
+                    save_latency_model(provider, model, self.model_file)
+                    fitted[provider] = model
+
+        with open(self.samples_file, 'w') as f:
+            json.dump(stored, f)
+        return fitted
+
+_recorder = None
+_recorder_lock = threading.Lock()
+
+def get_recorder():
+    """Return the shared recorder, or None if disabled via TTS_AUTOTUNE=0
+
+    The recorder saves its samples and refits models automatically at exit.
+    It is also off while recording or replaying HTTP fixtures: replayed
+    latencies aren't the provider's, and a refit after recording could change
+    the tuned batch size so the replay sends requests that were never recorded.
+    """
+    global _recorder
+
+    if os.getenv('TTS_AUTOTUNE', '1') == '0' or http_mode():
+        return None
+
+    with _recorder_lock:
+        if _recorder is None:
+            _recorder = LatencyRecorder()
+            atexit.register(_recorder.save)
+        return _recorder
+
+def tuned_chunk_size(provider, max_chars=None, model_file=DEFAULT_MODEL_FILE):
+    """Chunk size with the best predicted characters/sec for provider, within its limit"""
+    max_chars = max_chars or PROVIDER_CHAR_LIMITS[provider]
+    model = load_latency_model(provider, model_file)
+    return model.optimal_chars(max_chars, min(MIN_CHUNK_CHARS, max_chars))
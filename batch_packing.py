@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Cost- and latency-aware packing of ordered words into provider requests
+Minimizes the number of requests under the provider's true character limit,
+then balances batch lengths so the slowest concurrent request finishes sooner
+"""
+
+import os
+import json
+import heapq
+
+from text_splitter import PROVIDER_CHAR_LIMITS, split_text
+
+DEFAULT_MODEL_FILE = ".tts_latency_models.json"
+
+# Rough latency-vs-length defaults (seconds, seconds per character) used until measured
+DEFAULT_LATENCY_MODELS = {
+    "rime": (0.35, 0.002),
+    "elevenlabs": (0.5, 0.004),
+}
+
+class LatencyModel:
+    """Request latency model: overhead + per_char * chars + per_char2 * chars²
+
+    The quadratic term is zero unless enough measurements show latency
+    growing faster than linearly with length.
+    """
+
+    def __init__(self, overhead, per_char, per_char2=0.0):
+        self.overhead = overhead
+        self.per_char = per_char
+        self.per_char2 = per_char2
+
+    def predict(self, chars):
+        return self.overhead + self.per_char * chars + self.per_char2 * chars * chars
+
+    def throughput(self, chars):
+        """Characters synthesized per second by one request of this length"""
+        return chars / self.predict(chars) if chars else 0.0
+
+    def optimal_chars(self, max_chars, min_chars=1):
+        """Request length in [min_chars, max_chars] that maximizes throughput"""
+        if self.per_char2 <= 0:
+            return max_chars  # Throughput only grows with length
+        best = int((self.overhead / self.per_char2) ** 0.5)
+        return max(min_chars, min(max_chars, best))
+
+    def to_dict(self):
+        return {"overhead": self.overhead, "per_char": self.per_char, "per_char2": self.per_char2}
+
+    def __str__(self):
+        """Every term of the model, e.g. 400 ms + 2.00 ms/char + 0.0001 ms/char²"""
+        return (f"{self.overhead * 1000:.0f} ms + {self.per_char * 1000:.2f} ms/char "
+                f"+ {self.per_char2 * 1000:.4g} ms/char²")
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["overhead"], data["per_char"], data.get("per_char2", 0.0))
+
+    @classmethod
+    def fit(cls, samples):
+        """Least-squares fit from (chars, latency) samples
+
+        Tries a quadratic fit first and falls back to a straight line when
+        the curvature isn't positive or there are too few distinct lengths.
+        """
+        samples = list(samples)
+        if len(samples) < 2:
+            return None
+
+        if len({x for x, _ in samples}) >= 3:
+            coefficients = _least_squares(samples, degree=2)
+            if coefficients and coefficients[2] > 0 and coefficients[0] >= 0 and coefficients[1] >= 0:
+                return cls(*coefficients)
+
+        n = len(samples)
+        mean_x = sum(x for x, _ in samples) / n
+        mean_y = sum(y for _, y in samples) / n
+        var_x = sum((x - mean_x) ** 2 for x, _ in samples)
+        if var_x == 0:
+            return cls(mean_y, 0.0)
+        per_char = sum((x - mean_x) * (y - mean_y) for x, y in samples) / var_x
+        per_char = max(per_char, 0.0)
+        return cls(max(mean_y - per_char * mean_x, 0.0), per_char)
+
+def _least_squares(samples, degree):
+    """Polynomial least squares via the normal equations, or None if singular"""
+    size = degree + 1
+    matrix = [[sum(x ** (i + j) for x, _ in samples) for j in range(size)] for i in range(size)]
+    vector = [sum(y * x ** i for x, y in samples) for i in range(size)]
+
+    # Gaussian elimination with partial pivoting
+    for col in range(size):
+        pivot = max(range(col, size), key=lambda row: abs(matrix[row][col]))
+        if abs(matrix[pivot][col]) < 1e-12:
+            return None
+        matrix[col], matrix[pivot] = matrix[pivot], matrix[col]
+        vector[col], vector[pivot] = vector[pivot], vector[col]
+        for row in range(col + 1, size):
+            factor = matrix[row][col] / matrix[col][col]
+            for k in range(col, size):
+                matrix[row][k] -= factor * matrix[col][k]
+            vector[row] -= factor * vector[col]
+
+    solution = [0.0] * size
+    for row in reversed(range(size)):
+        total = vector[row] - sum(matrix[row][k] * solution[k] for k in range(row + 1, size))
+        solution[row] = total / matrix[row][row]
+    return solution
+
+def load_latency_model(provider, path=DEFAULT_MODEL_FILE):
+    """Return the measured model for provider from path, or the built-in default"""
+    if os.path.exists(path):
+        try:
+            with open(path, 'r') as f:
+                models = json.load(f)
+            if provider in models:
+                return LatencyModel.from_dict(models[provider])
+        except (OSError, ValueError, KeyError):
+            pass
+    return LatencyModel(*DEFAULT_LATENCY_MODELS[provider])
+
+def save_latency_model(provider, model, path=DEFAULT_MODEL_FILE):
+    """Store provider's model in path, keeping other providers' models"""
+    models = {}
+    if os.path.exists(path):
+        try:
+            with open(path, 'r') as f:
+                models = json.load(f)
+        except (OSError, ValueError):
+            models = {}
+    models[provider] = model.to_dict()
+    with open(path, 'w') as f:
+        json.dump(models, f, indent=2)
+
+def batch_text_length(lengths):
+    """Length of ", ".join(words) + "." for words of the given lengths"""
+    return sum(lengths) + 2 * (len(lengths) - 1) + 1 if lengths else 0
+
+def _greedy_cuts(lengths, max_chars):
+    """Cut ordered words into as few contiguous batches of at most max_chars as possible"""
+    batches = []
+    start = 0
+    current = 0
+    for i, length in enumerate(lengths):
+        # A new batch costs length + 1 (the "."), each extra word adds ", " + length
+        added = length + 1 if i == start else length + 2
+        if i > start and current + added > max_chars:
+            batches.append((start, i))
+            start = i
+            current = length + 1
+        else:
+            current += added
+    if start < len(lengths):
+        batches.append((start, len(lengths)))
+    return batches
+
+def _balanced_cuts(lengths, count, max_chars):
+    """Contiguous cuts into at most `count` batches minimizing the longest batch"""
+    low = max(length + 1 for length in lengths)
+    high = max_chars
+    best = _greedy_cuts(lengths, high)
+    while low <= high:
+        middle = (low + high) // 2
+        cuts = _greedy_cuts(lengths, middle)
+        if len(cuts) <= count:
+            best = cuts
+            high = middle - 1
+        else:
+            low = middle + 1
+    return best
+
+def estimate_makespan(batch_lengths, model, concurrency):
+    """Predicted wall time for sending batches in order with `concurrency` workers"""
+    workers = [0.0] * max(concurrency, 1)
+    finish = 0.0
+    for length in batch_lengths:
+        start = heapq.heappop(workers)
+        end = start + model.predict(length)
+        finish = max(finish, end)
+        heapq.heappush(workers, end)
+    return finish
+
+def pack_batches(words, max_chars, concurrency=1, model=None, extra_requests=0):
+    """Pack ordered words into contiguous batches under max_chars
+
+    Uses the minimum possible number of requests (plus up to `extra_requests`
+    more if they shorten the predicted makespan), with batch lengths balanced
+    so that the slowest request under `concurrency` finishes as early as possible.
+    """
+    if not words:
+        return []
+
+    # A single word over the limit would produce an over-limit request, so split it first
+    pieces = []
+    for word in words:
+        pieces.extend(split_text(word, max_chars - 1) if len(word) + 1 > max_chars else [word])
+
+    model = model or LatencyModel(*DEFAULT_LATENCY_MODELS["rime"])
+    lengths = [len(piece) for piece in pieces]
+    min_count = len(_greedy_cuts(lengths, max_chars))
+
+    best_cuts = None
+    best_key = None
+    for count in range(min_count, min(min_count + extra_requests, len(pieces)) + 1):
+        cuts = _balanced_cuts(lengths, count, max_chars)
+        batch_lengths = [batch_text_length(lengths[start:end]) for start, end in cuts]
+        key = (round(estimate_makespan(batch_lengths, model, concurrency), 6), len(cuts))
+        if best_key is None or key < best_key:
+            best_cuts, best_key = cuts, key
+
+    return [pieces[start:end] for start, end in best_cuts]
+
+def pack_for_provider(words, provider, concurrency=1, extra_requests=0, model_file=DEFAULT_MODEL_FILE):
+    """Pack words under the provider's limit using its measured latency model"""
+    return pack_batches(words, PROVIDER_CHAR_LIMITS[provider], concurrency,
+                        load_latency_model(provider, model_file), extra_requests)
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Latency benchmark for the RIME.ai and ElevenLabs TTS APIs
+Runs the test words & sentences against each provider N times and reports
+latency percentiles, time-to-first-byte, throughput and real-time factor
+"""
+
+import os
+import sys
+import json
+import time
+import base64
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from tts_client import get_client, get_api_key, RIME_API_URL, ELEVENLABS_API_URL
+from mp3_concat import mp3_duration
+from mock_tts_server import start_mock_server, add_latency_arguments, latency_from_args
+from batch_packing import LatencyModel, save_latency_model, DEFAULT_MODEL_FILE
+
+PROVIDERS = ["rime", "elevenlabs"]
+
+# Character length buckets used to break down the report
+LENGTH_BUCKETS = [(0, 25), (25, 100), (100, 250), (250, 500), (500, None)]
+
+def load_corpus(words_file="test_words.txt"):
+    """Return (kind, text) pairs for every test word and sentence"""
+    from rime_full import load_test_words
+    from sentence_test_script import get_test_sentences
+
+    corpus = [("word", word) for word in load_test_words(words_file)]
+    corpus += [("sentence", sentence) for sentence in get_test_sentences()]
+    return corpus
+
+def read_streamed(response, start):
+    """Read a streamed response body, returning (body, time to first byte)"""
+    first_byte = None
+    body = bytearray()
+    for chunk in response.iter_content(chunk_size=8192):
+        if chunk and first_byte is None:
+            first_byte = time.perf_counter() - start
+        body += chunk
+    return bytes(body), first_byte
+
+def synthesize_rime(text, api_key, url):
+    """Send one RIME request and return (status, audio bytes, time to first byte)"""
+    client = get_client("rime", api_key, url=url, rate_limited=False, record_latency=False, retried=False)
+
+    start = time.perf_counter()
+    response = client.post(client.build_payload(text), timeout=60, stream=True)
+    body, first_byte = read_streamed(response, start)
+
+    if response.status_code != 200:
+        return response.status_code, b"", first_byte
+    audio = base64.b64decode(json.loads(body).get('audioContent', ''))
+    return response.status_code, audio, first_byte
+
+def synthesize_elevenlabs(text, api_key, url):
+    """Send one streaming ElevenLabs request and return (status, audio bytes, time to first byte)"""
+    client = get_client("elevenlabs", api_key, url=url, rate_limited=False, record_latency=False, retried=False)
+
+    start = time.perf_counter()
+    response = client.post(client.build_payload(text), timeout=120, stream=True)
+    body, first_byte = read_streamed(response, start)
+
+    if response.status_code != 200:
+        return response.status_code, b"", first_byte
+    return response.status_code, body, first_byte
+
+def measure(provider, kind, text, api_key, url):
+    """Time a single synthesis request and return its metrics"""
+    synthesize = synthesize_rime if provider == "rime" else synthesize_elevenlabs
+
+    start = time.perf_counter()
+    try:
+        status, audio, first_byte = synthesize(text, api_key, url)
+    except requests.exceptions.RequestException as e:
+        status, audio, first_byte = str(e), b"", None
+    latency = time.perf_counter() - start
+
+    return {
+        "provider": provider,
+        "kind": kind,
+        "chars": len(text),
+        "ok": status == 200,
+        "status": status,
+        "latency": latency,
+        "ttfb": first_byte,
+        "bytes": len(audio),
+        "audio_seconds": mp3_duration(audio) if audio else 0.0,
+    }
+
+def run_benchmark(providers, corpus, runs, api_keys, urls, concurrency=1):
+    """Run every corpus item against every provider `runs` times"""
+    jobs = [
+        (provider, kind, text)
+        for _ in range(runs)
+        for provider in providers
+        for kind, text in corpus
+    ]
+
+    with ThreadPoolExecutor(max_workers=max(concurrency, 1)) as executor:
+        futures = [
+            executor.submit(measure, provider, kind, text, api_keys[provider], urls[provider])
+            for provider, kind, text in jobs
+        ]
+        return [future.result() for future in futures]
+
+def percentile(values, pct):
+    """Linear-interpolated percentile of a list of numbers"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * pct / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+def bucket_label(chars):
+    """Return the length bucket label for a character count"""
+    for low, high in LENGTH_BUCKETS:
+        if high is None or chars < high:
+            return f"{low}+" if high is None else f"{low}-{high - 1}"
+    return "?"
+
+def summarize(results):
+    """Aggregate results per provider, overall and per length bucket"""
+    groups = {}
+    for result in results:
+        groups.setdefault((result["provider"], "all"), []).append(result)
+        groups.setdefault((result["provider"], bucket_label(result["chars"])), []).append(result)
+
+    summary = []
+    for (provider, bucket), group in groups.items():
+        ok = [r for r in group if r["ok"]]
+        latencies = [r["latency"] for r in ok]
+        ttfbs = [r["ttfb"] for r in ok if r["ttfb"] is not None]
+        wall = sum(latencies)
+        summary.append({
+            "provider": provider,
+            "bucket": bucket,
+            "requests": len(group),
+            "errors": len(group) - len(ok),
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "ttfb_p50": percentile(ttfbs, 50),
+            "ttfb_p95": percentile(ttfbs, 95),
+            "bytes_per_sec": sum(r["bytes"] for r in ok) / wall if wall else 0.0,
+            "rtf": sum(r["audio_seconds"] for r in ok) / wall if wall else 0.0,
+        })
+
+    bucket_order = ["all"] + [bucket_label(low) for low, _ in LENGTH_BUCKETS]
+    summary.sort(key=lambda row: (row["provider"], bucket_order.index(row["bucket"])))
+    return summary
+
+def print_report(summary):
+    """Print the summary as a table"""
+    def ms(value):
+        return f"{value * 1000:8.0f}" if value is not None else f"{'-':>8}"
+
+    print(f"\n{'provider':<11} {'chars':<8} {'reqs':>5} {'err':>4} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'ttfb50':>8} {'ttfb95':>8} "
+          f"{'KB/s':>8} {'RTF':>6}")
+    print("-" * 92)
+    for row in summary:
+        print(f"{row['provider']:<11} {row['bucket']:<8} {row['requests']:>5} {row['errors']:>4} "
+              f"{ms(row['p50'])} {ms(row['p95'])} {ms(row['p99'])} "
+              f"{ms(row['ttfb_p50'])} {ms(row['ttfb_p95'])} "
+              f"{row['bytes_per_sec'] / 1024:8.1f} {row['rtf']:6.2f}")
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Benchmark TTS provider latency")
+    parser.add_argument("--providers", nargs="+", choices=PROVIDERS, default=PROVIDERS)
+    parser.add_argument("--runs", type=int, default=3, help="Times to synthesize each corpus item")
+    parser.add_argument("--concurrency", type=int, default=1, help="Requests in flight at once")
+    parser.add_argument("--words-only", action="store_true", help="Skip the sentence corpus")
+    parser.add_argument("--mock", action="store_true",
+                        help="Benchmark against a local mock server instead of the real APIs")
+    parser.add_argument("--json", metavar="FILE", help="Write raw results & summary as JSON")
+    parser.add_argument("--save-model", action="store_true",
+                        help=f"Fit latency-vs-length models and save them to {DEFAULT_MODEL_FILE} "
+                             "for batch packing")
+    add_latency_arguments(parser)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    # Change to script directory
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    os.chdir(script_dir)
+
+    corpus = load_corpus()
+    if args.words_only:
+        corpus = [item for item in corpus if item[0] == "word"]
+
+    server = None
+    if args.mock:
+        server = start_mock_server(latency=latency_from_args(args))
+        print(f"🧪 Using mock TTS server at {server.base_url}")
+        api_keys = {provider: "mock-key" for provider in PROVIDERS}
+        urls = {"rime": server.rime_url, "elevenlabs": server.elevenlabs_url}
+    else:
+        api_keys = {provider: get_api_key(provider) for provider in PROVIDERS}
+        urls = {
+            "rime": os.getenv('RIME_API_URL', RIME_API_URL),
+            "elevenlabs": os.getenv('ELEVENLABS_API_URL', ELEVENLABS_API_URL),
+        }
+        missing = [p for p in args.providers if not api_keys[p]]
+        if missing:
+            print(f"❌ Missing API key for: {', '.join(missing)} (or use --mock)")
+            return False
+
+    print(f"Benchmarking {', '.join(args.providers)}: {len(corpus)} items x {args.runs} runs, "
+          f"concurrency {args.concurrency}")
+    start = time.perf_counter()
+    try:
+        results = run_benchmark(args.providers, corpus, args.runs, api_keys, urls, args.concurrency)
+    finally:
+        if server:
+            server.shutdown()
+    elapsed = time.perf_counter() - start
+
+    summary = summarize(results)
+    print_report(summary)
+    print(f"\n⏱️ Total wall time: {elapsed:.2f}s for {len(results)} requests")
+
+    if args.save_model:
+        for provider in args.providers:
+            model = LatencyModel.fit(
+                (r["chars"], r["latency"]) for r in results if r["provider"] == provider and r["ok"]
+            )
+            if model:
+                save_latency_model(provider, model)
+                print(f"📈 {provider}: {model} saved to {DEFAULT_MODEL_FILE}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({"summary": summary, "results": results}, f, indent=2)
+        print(f"📁 Results written to {args.json}")
+
+    return all(row["errors"] == 0 for row in summary)
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
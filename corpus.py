@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Streaming corpus ingestion for large pronunciation sets
+Reads text, JSONL or CSV corpora lazily, with category and locale metadata,
+and runs them through a load -> batch -> synthesize -> write generator
+pipeline. Only a bounded number of batches is ever in flight, and audio is
+appended to the output as it arrives, so memory stays flat however many
+terms the corpus holds.
+
+Corpus formats (chosen by extension):
+    .txt    one text per line; a "# Category" line sets the category of the lines after it
+    .jsonl  {"text": ..., "category": ..., "locale": ..., "id": ...} per line
+    .csv    header row with a "text" column and optional category/locale/id columns
+
+Usage:
+    python corpus.py brands.csv --providers rime elevenlabs --output-prefix brands
+    python corpus.py brands.jsonl --stats
+"""
+
+import os
+import csv
+import sys
+import json
+import argparse
+from collections import deque, namedtuple, Counter
+
+from mp3_concat import extract_audio_frames
+from text_splitter import PROVIDER_CHAR_LIMITS, split_text
+from instrumentation import run_instrumented
+
+DEFAULT_LOCALE = "en-US"
+DEFAULT_MAX_IN_FLIGHT = 32
+SENTENCE_PUNCTUATION = ".!?…"
+
+CorpusItem = namedtuple("CorpusItem", ["text", "category", "locale", "id"])
+
+def _iter_text(f, category, locale):
+    for number, line in enumerate(f, 1):
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("#"):
+            category = line.lstrip("#").strip() or category
+            continue
+        yield CorpusItem(line, category, locale, str(number))
+
+def _iter_jsonl(f, category, locale):
+    for number, line in enumerate(f, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            print(f"⚠️ Skipping malformed JSON on line {number}")
+            continue
+        text = (record.get("text") or "").strip()
+        if text:
+            yield CorpusItem(text, record.get("category", category), record.get("locale", locale),
+                             str(record.get("id", number)))
+
+def _iter_csv(f, category, locale):
+    for number, row in enumerate(csv.DictReader(f), 1):
+        text = (row.get("text") or "").strip()
+        if text:
+            yield CorpusItem(text, row.get("category") or category, row.get("locale") or locale,
+                             row.get("id") or str(number))
+
+READERS = {
+    ".txt": _iter_text,
+    ".jsonl": _iter_jsonl,
+    ".csv": _iter_csv,
+}
+
+def iter_corpus(path, category=None, locale=DEFAULT_LOCALE):
+    """Yield CorpusItems from a text, JSONL or CSV file one at a time
+
+    category and locale are the defaults for items that don't carry their own.
+    """
+    reader = READERS.get(os.path.splitext(path)[1].lower())
+    if reader is None:
+        raise ValueError(f"Unsupported corpus format: {path} (use {', '.join(READERS)})")
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        yield from reader(f, category, locale)
+
+def join_texts(texts):
+    """One request's text: items end in their own sentence punctuation, or are
+    separated by commas and closed with a period (like the word lists)"""
+    parts = []
+    for i, text in enumerate(texts):
+        if text[-1] not in SENTENCE_PUNCTUATION:
+            text += "." if i == len(texts) - 1 else ","
+        parts.append(text)
+    return " ".join(parts)
+
+def _fit_items(items, max_chars):
+    """Yield items, splitting any whose text (plus its closing punctuation) exceeds max_chars"""
+    for item in items:
+        if len(item.text) + 1 <= max_chars:
+            yield item
+            continue
+        for piece in split_text(item.text, max_chars - 1):
+            yield item._replace(text=piece)
+
+def batch_items(items, max_chars):
+    """Group consecutive items into batches whose joined text fits max_chars
+
+    Streams: each batch is yielded as soon as it is full. Batches never mix
+    locales, so each request can be voiced for one language. Items too long
+    for one request are split at sentence, clause or word boundaries into
+    pieces that keep the item's id, category and locale.
+    """
+    batch = []
+    length = 0
+    for item in _fit_items(items, max_chars):
+        added = len(item.text) + 1 + (1 if batch else 0)
+        if batch and (length + added > max_chars or item.locale != batch[0].locale):
+            yield batch
+            batch = []
+            length = 0
+            added = len(item.text) + 1
+        batch.append(item)
+        length += added
+    if batch:
+        yield batch
+
+class CorpusWriter:
+    """Appends batch audio to one provider's MP3 and a JSONL index of where each item's batch sits"""
+
+    def __init__(self, output_file):
+        self.output_file = output_file
+        self.index_file = os.path.splitext(output_file)[0] + ".index.jsonl"
+        self._audio = open(output_file, 'wb')
+        self._index = open(self.index_file, 'w', encoding='utf-8')
+        self.batches = 0
+        self.items = 0
+        self.failed = 0
+
+    def write(self, batch, audio_bytes):
+        record = {"batch": self.batches, "items": [item._asdict() for item in batch]}
+        if audio_bytes is None:
+            record["failed"] = True
+            self.failed += len(batch)
+        else:
+            frames = extract_audio_frames(audio_bytes)
+            record["offset"] = self._audio.tell()
+            record["length"] = len(frames)
+            self._audio.write(frames)
+            self.items += len(batch)
+        self._index.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.batches += 1
+
+    def close(self):
+        self._audio.close()
+        self._index.close()
+
+def synthesize_corpus(items, providers, output_prefix, scheduler, max_chars=None,
+                      max_in_flight=DEFAULT_MAX_IN_FLIGHT):
+    """Synthesize a stream of CorpusItems with every provider, writing each provider's audio in order
+
+    Every batch is sent to all providers through the shared scheduler. At
+    most max_in_flight requests are submitted or waiting to be written at
+    once, so memory stays bounded by that rather than by the corpus size.
+    Returns {provider: CorpusWriter}.
+    """
+    max_chars = max_chars or min(PROVIDER_CHAR_LIMITS[provider] for provider in providers)
+    writers = {provider: CorpusWriter(f"{output_prefix}_{provider}.mp3") for provider in providers}
+    pending = deque()
+
+    def write_oldest():
+        provider, batch, job = pending.popleft()
+        writers[provider].write(batch, job.result())
+
+    try:
+        for batch in batch_items(items, max_chars):
+            text = join_texts([item.text for item in batch])
+            for provider in providers:
+                if len(pending) >= max_in_flight:
+                    write_oldest()
+                pending.append((provider, batch, scheduler.submit(provider, text)))
+        while pending:
+            write_oldest()
+    finally:
+        for writer in writers.values():
+            writer.close()
+    return writers
+
+def print_corpus_stats(items):
+    """Count items by category and locale in one pass"""
+    categories = Counter()
+    locales = Counter()
+    total = chars = 0
+    for item in items:
+        categories[item.category or "(none)"] += 1
+        locales[item.locale or "(none)"] += 1
+        total += 1
+        chars += len(item.text)
+    print(f"📚 {total} items, {chars} characters")
+    for label, counts in (("Category", categories), ("Locale", locales)):
+        for name, count in counts.most_common():
+            print(f"   {label:<9} {name:<28} {count:>8}")
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Synthesize a large corpus with bounded memory")
+    parser.add_argument("corpus", help="Text, JSONL or CSV corpus file")
+    parser.add_argument("--providers", nargs="+", default=["rime"], choices=list(PROVIDER_CHAR_LIMITS))
+    parser.add_argument("--output-prefix", default=None,
+                        help="Output name; writes <prefix>_<provider>.mp3 & .index.jsonl (default: corpus name)")
+    parser.add_argument("--category", default=None, help="Category for items without one")
+    parser.add_argument("--locale", default=DEFAULT_LOCALE, help="Locale for items without one")
+    parser.add_argument("--max-chars", type=int, default=None,
+                        help="Characters per request (default: the smallest provider limit)")
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help="Requests in flight across all providers (default: TTS_MAX_CONCURRENCY or 8)")
+    parser.add_argument("--max-in-flight", type=int, default=DEFAULT_MAX_IN_FLIGHT,
+                        help="Batches submitted or awaiting write at once")
+    parser.add_argument("--stats", action="store_true", help="Only count items by category and locale")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not os.path.exists(args.corpus):
+        print(f"❌ {args.corpus} not found")
+        return False
+
+    items = iter_corpus(args.corpus, args.category, args.locale)
+    if args.stats:
+        print_corpus_stats(items)
+        return True
+
+    from tts_client import get_api_key
+    from scheduler import DEFAULT_CONCURRENCY, JobScheduler, budgets_from_env
+
+    for provider in args.providers:
+        if not get_api_key(provider):
+            print(f"Error: {provider.upper()}_API_KEY not found in environment")
+            return False
+
+    output_prefix = args.output_prefix or os.path.splitext(os.path.basename(args.corpus))[0]
+    concurrency = args.concurrency or int(os.getenv('TTS_MAX_CONCURRENCY', DEFAULT_CONCURRENCY))
+    scheduler = JobScheduler(concurrency, budgets_from_env(args.providers), os.getenv('TTS_SCHEDULE_POLICY', "sjf"))
+    print(f"🎵 Synthesizing {args.corpus} with {', '.join(args.providers)}...")
+    with scheduler:
+        writers = synthesize_corpus(items, args.providers, output_prefix, scheduler, args.max_chars,
+                                    args.max_in_flight)
+    scheduler.print_stats()
+
+    for provider, writer in writers.items():
+        size = os.path.getsize(writer.output_file) / 1024 / 1024
+        status = "✅" if not writer.failed else "⚠️"
+        print(f"{status} {provider}: {writer.items} items in {writer.batches} batches, {writer.failed} failed "
+              f"-> {writer.output_file} ({size:.2f} MB), index {writer.index_file}")
+    return all(not writer.failed for writer in writers.values())
+
+if __name__ == "__main__":
+    sys.exit(0 if run_instrumented(main, "corpus") else 1)
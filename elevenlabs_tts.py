@@ -6,13 +6,27 @@ Generates a single combined audio file with all test words
 
 import os
 import sys
+import argparse
 import requests
 import time
 
+from tts_cache import get_default_cache
+from tts_client import get_client, get_api_key
+from scheduler import get_scheduler
+from mp3_concat import extract_audio_frames
+from text_splitter import split_text, synthesize_chunks, iter_synthesized
+from auto_tune import tuned_chunk_size
+from batch_packing import pack_batches, load_latency_model
+from post_process import post_process_clips, add_post_process_arguments, options_from_args
+from incremental import (DEFAULT_SEGMENT_CHARS, load_segments, plan_segments, schedule_batches,
+                         reused_words, splice_output)
+from instrumentation import span, run_instrumented
+
 def load_test_words(filename):
     """Load test words from file"""
-    with open(filename, 'r', encoding='utf-8') as f:
+    with span("load_words", file=filename) as s, open(filename, 'r', encoding='utf-8') as f:
         words = [line.strip() for line in f if line.strip()]
+        s.set(words=len(words), chars=sum(len(word) for word in words))
     return words
 
 def create_combined_text(words):
@@ -21,11 +35,141 @@ def create_combined_text(words):
     text = ", ".join(words)
     return text + "."
 
-def generate_elevenlabs_audio(text, output_file):
-    """Generate audio using ElevenLabs API"""
+def synthesize_elevenlabs_chunk(client, text, previous_text=None, next_text=None):
+    """Synthesize one chunk of text, returning MP3 bytes or None
+
+    previous_text/next_text are the neighbouring chunks, sent as context.
+    The request goes through the process-wide scheduler, which answers
+    identical requests from the cache and applies ELEVENLABS_CHAR_BUDGET.
+    """
+    data = client.build_payload(text, previous_text, next_text)
+    return get_scheduler().submit("elevenlabs", text, client=client, payload=data).result()
+
+def post_process_output(output_file, options, workers=None):
+    """Trim, normalize and transcode output_file in place through post_process_clips, like the RIME clips"""
+    with open(output_file, 'rb') as f:
+        clips = [f.read()]
+    processed = post_process_clips(clips, options, workers)
+    if processed is None:
+        return False
+    temp_file = output_file + ".tmp"
+    with span("write_output", file=output_file, bytes=len(processed[0])), open(temp_file, 'wb') as f:
+        f.write(processed[0])
+    os.replace(temp_file, output_file)
+    return True
+
+def generate_elevenlabs_chunked(text, output_file, chunk_chars, concurrency=4, api_key=None, timings=None):
+    """Generate audio in chunks of at most chunk_chars, split at sentence boundaries
+
+    Chunks are synthesized `concurrency` at a time, each with its neighbours'
+    text as previous_text/next_text so prosody carries across the joins, and
+    are appended in order as soon as they and every earlier chunk are ready.
+    The audio streams into a temporary file next to output_file, which only
+    replaces output_file once every chunk is written, so a failure leaves the
+    previous output intact. A failed or timed-out chunk costs only itself:
+    finished chunks are cached, so a re-run requests just the missing ones.
+    If a timings dict is passed it receives time-to-first-chunk and total seconds.
+    """
+    api_key = api_key or get_api_key("elevenlabs")
+    client = get_client("elevenlabs", api_key)
+
+    with span("split_text", chars=len(text)):
+        chunks = split_text(text, chunk_chars)
+    print(f"✂️ Splitting {len(text)} characters into {len(chunks)} chunks of up to {chunk_chars}")
+
+    def synthesize(i):
+        return synthesize_elevenlabs_chunk(client, chunks[i],
+                                           previous_text=chunks[i - 1] if i > 0 else None,
+                                           next_text=chunks[i + 1] if i + 1 < len(chunks) else None)
+
+    start = time.perf_counter()
+    first_chunk = None
+    failed = None
+    temp_file = output_file + ".tmp"
+    try:
+        with span("stream_to_file", provider="elevenlabs", file=output_file) as s, open(temp_file, 'wb') as f:
+            for i, audio_bytes in enumerate(iter_synthesized(range(len(chunks)), synthesize, concurrency), 1):
+                if audio_bytes is None:
+                    failed = i
+                    break
+                f.write(extract_audio_frames(audio_bytes))
+                if first_chunk is None:
+                    first_chunk = time.perf_counter() - start
+                print(f"🔊 Chunk {i}/{len(chunks)} written ({time.perf_counter() - start:.2f}s)")
+            s.set(bytes=f.tell(), chunks=len(chunks))
+    except BaseException:
+        os.remove(temp_file)
+        raise
+
+    if failed:
+        os.remove(temp_file)
+        print(f"❌ Chunk {failed}/{len(chunks)} failed; finished chunks are cached for the next run")
+        return False
+    os.replace(temp_file, output_file)
+
+    total = time.perf_counter() - start
+    if timings is not None:
+        timings["ttfb"] = first_chunk
+        timings["total"] = total
+    print(f"⏱️ First chunk written after {first_chunk or 0:.2f}s, total: {total:.2f}s")
+    print(f"✅ ElevenLabs audio saved to: {output_file}")
+    return True
+
+def generate_elevenlabs_incremental(words, output_file, segment_chars=DEFAULT_SEGMENT_CHARS, concurrency=4,
+                                    post_process=None, workers=None):
+    """Synthesize only words added or changed since the last incremental run
+
+    Words are requested in segments of at most segment_chars, and the new
+    segments are spliced between the unchanged ones of the existing output.
+    post_process, if given, is the PostProcessOptions applied to each new
+    segment before splicing.
+    """
+    api_key = get_api_key("elevenlabs")
+    if not api_key:
+        print("Error: ELEVENLABS_API_KEY not found in environment")
+        return False
+
+    client = get_client("elevenlabs", api_key)
+
+    settings = {"post_process": list(post_process) if post_process else None}
+
+    def segment_key(batch):
+        return client.cache_key(client.build_payload(create_combined_text(batch)))
+
+    plan = plan_segments(words, load_segments(output_file, settings), segment_key)
+    reused = reused_words(plan)
+    print(f"♻️ Incremental: reusing {reused} words from {output_file}, synthesizing {len(words) - reused}")
+
+    model = load_latency_model("elevenlabs")
+    layout, batches = schedule_batches(plan, lambda run: pack_batches(run, segment_chars, concurrency, model))
+    texts = [create_combined_text(batch) for batch in batches]
+    parts = synthesize_chunks(texts, lambda text: synthesize_elevenlabs_chunk(client, text), concurrency)
+    if any(part is None for part in parts):
+        return False
+    if post_process and parts:
+        parts = post_process_clips(parts, post_process, workers)
+        if parts is None:
+            return False
+
+    try:
+        splice_output(layout, batches, parts, output_file, segment_key, settings)
+    except OSError as e:
+        print(f"❌ Error writing {output_file}: {e}")
+        return False
+    print(f"✅ ElevenLabs audio saved to: {output_file} ({len(batches)} new of {len(layout)} segments)")
+    return True
+
+def generate_elevenlabs_audio(text, output_file, stream=False, timings=None, chunk_chars=None, api_key=None):
+    """Generate audio using ElevenLabs API
+
+    With stream=True the streaming endpoint is used and chunks are written to
+    output_file as they arrive. If a timings dict is passed it receives
+    time-to-first-byte and total duration in seconds. Without streaming, text
+    longer than chunk_chars is synthesized in chunks of that size.
+    """
 
     # Check for API key
-    api_key = os.getenv('ELEVENLABS_API_KEY')
+    api_key = api_key or get_api_key("elevenlabs")
     if not api_key:
         print("Error: ELEVENLABS_API_KEY not found in environment")
         return False
@@ -34,51 +178,78 @@ def generate_elevenlabs_audio(text, output_file):
         print("Generating ElevenLabs audio...")
         print(f"Text length: {len(text)} characters")
 
+        if chunk_chars and len(text) > chunk_chars and not stream:
+            return generate_elevenlabs_chunked(text, output_file, chunk_chars, api_key=api_key, timings=timings)
+
         # Use Rachel voice (American female) - clear American accent
-        voice_id = "21m00Tcm4TlvDq8ikWAM"  # Rachel
-
-        # ElevenLabs API endpoint
-        url = f"https://api.elevenlabs.io/v1/text-to-speech/{voice_id}"
-
-        headers = {
-            "Accept": "audio/mpeg",
-            "Content-Type": "application/json",
-            "xi-api-key": api_key
-        }
-
-        data = {
-            "text": text,
-            "model_id": "eleven_multilingual_v2",
-            "language_code": "en",  # Explicitly specify English
-            "voice_settings": {
-                "stability": 0.75,
-                "similarity_boost": 0.75,
-                "style": 0.0,
-                "use_speaker_boost": True
-            }
-        }
-
-        print("Sending request to ElevenLabs...")
-        response = requests.post(url, json=data, headers=headers, timeout=120)
-
-        if response.status_code == 200:
-            with open(output_file, 'wb') as f:
-                f.write(response.content)
-            print(f"✅ ElevenLabs audio saved to: {output_file}")
-            return True
+        client = get_client("elevenlabs", api_key)
+        data = client.build_payload(text)
+
+        if stream:
+            # Streamed audio is written as it arrives, so it bypasses the scheduler and its cache lookup
+            cache = get_default_cache()
+            audio_bytes = cache.get(client.cache_key(data)) if cache else None
+            if audio_bytes is not None:
+                with open(output_file, 'wb') as f:
+                    f.write(audio_bytes)
+                print(f"✅ ElevenLabs audio saved to: {output_file} (cached)")
+                return True
+
+            print("Sending request to ElevenLabs...")
+            start = time.perf_counter()
+            first_byte = client.synthesize_stream(data, output_file, cache)
         else:
-            print(f"❌ ElevenLabs API error: {response.status_code}")
-            print(f"Response: {response.text}")
-            return False
+            # Queued with every other request in this process; identical requests come from the cache
+            print("Sending request to ElevenLabs...")
+            start = time.perf_counter()
+            job = get_scheduler().submit("elevenlabs", text, client=client, payload=data)
+            audio_bytes = job.result()
+            if audio_bytes is None:
+                return False
+            first_byte = time.perf_counter() - start
+            with span("write_output", file=output_file, bytes=len(audio_bytes)), open(output_file, 'wb') as f:
+                f.write(audio_bytes)
+            if job.cached:
+                print(f"✅ ElevenLabs audio saved to: {output_file} (cached)")
+                return True
+        total = time.perf_counter() - start
+
+        if timings is not None:
+            timings["ttfb"] = first_byte
+            timings["total"] = total
+        print(f"⏱️ Time to first byte: {first_byte or 0:.2f}s, total: {total:.2f}s")
+        print(f"✅ ElevenLabs audio saved to: {output_file}")
+        return True
 
     except requests.exceptions.Timeout:
         print("❌ Request timed out - try reducing text length")
         return False
+    except requests.exceptions.HTTPError as e:
+        print(f"❌ {e}")
+        return False
     except Exception as e:
         print(f"❌ Error generating ElevenLabs audio: {e}")
         return False
 
-def main():
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Generate ElevenLabs audio for all test words")
+    parser.add_argument("--stream", action="store_true",
+                        help="Use the streaming endpoint and write audio as it arrives")
+    parser.add_argument("--max-chars", type=int, default=None,
+                        help="Characters per request (default: auto-tuned from past runs)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only synthesize words added or changed since the last incremental run and splice them in")
+    parser.add_argument("--segment-chars", type=int, default=DEFAULT_SEGMENT_CHARS,
+                        help="With --incremental, largest segment to request, so later edits redo less")
+    parser.add_argument("--post-process", action="store_true",
+                        help="Trim silence, normalize loudness and transcode the audio, as rime_full.py does")
+    add_post_process_arguments(parser)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+
     # Change to script directory
     script_dir = os.path.dirname(os.path.abspath(__file__))
     os.chdir(script_dir)
@@ -90,9 +261,21 @@ def main():
     # Create combined text
     combined_text = create_combined_text(words)
 
+    # Pick the request size with the best measured throughput
+    chunk_chars = args.max_chars or tuned_chunk_size("elevenlabs")
+
     # Generate audio
     output_file = "elevenlabs_all_words.mp3"
-    success = generate_elevenlabs_audio(combined_text, output_file)
+    post_process = options_from_args(args) if args.post_process else None
+    if args.incremental:
+        success = generate_elevenlabs_incremental(words, output_file, min(chunk_chars, args.segment_chars),
+                                                  post_process=post_process, workers=args.workers)
+    else:
+        success = generate_elevenlabs_audio(combined_text, output_file, stream=args.stream,
+                                            chunk_chars=chunk_chars)
+        if success and post_process:
+            success = post_process_output(output_file, post_process, args.workers)
+    get_scheduler().print_stats()
 
     if success:
         print(f"\n🎉 Successfully generated {output_file}")
@@ -102,9 +285,13 @@ def main():
         if os.path.exists(output_file):
             size = os.path.getsize(output_file) / 1024 / 1024  # MB
             print(f"📁 File size: {size:.2f} MB")
+
+        cache = get_default_cache()
+        if cache:
+            cache.print_stats()
     else:
         print("\n❌ Failed to generate audio")
-        sys.exit(1)
+    return success
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(0 if run_instrumented(main, "elevenlabs_tts") else 1)
\ No newline at end of file
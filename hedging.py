@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Hedged requests for short synthesis calls
+If a request hasn't answered by a chosen latency percentile, one duplicate is
+sent and whichever answers first wins, so a single slow response doesn't hold
+up ordered reassembly
+"""
+
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, FIRST_COMPLETED, wait
+
+import requests
+
+from batch_packing import load_latency_model
+
+DEFAULT_HEDGE_PERCENTILE = 95
+DEFAULT_WINDOW = 200
+MIN_SAMPLES = 10
+INITIAL_SLOWDOWN = 2.0  # Hedge at 2x the predicted latency until enough samples are in
+
+def _percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    rank = max(int(round(pct / 100 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+def _discard(future):
+    """Cancel a losing request, or close its response once it arrives"""
+    if future.cancel():
+        return
+
+    def close(done):
+        if done.exception() is None:
+            done.result().close()
+
+    future.add_done_callback(close)
+
+class Hedger:
+    """Per-provider hedging policy and counters
+
+    Latencies are tracked relative to the provider's latency model, so one
+    percentile works across short words and longer sentences: the hedge delay
+    for a request is predict(chars) times the chosen percentile of recent
+    observed/predicted ratios.
+    """
+
+    def __init__(self, provider, percentile=DEFAULT_HEDGE_PERCENTILE, window=DEFAULT_WINDOW, max_workers=32):
+        self.provider = provider
+        self.percentile = percentile
+        self.model = load_latency_model(provider)
+        self.ratios = deque(maxlen=window)
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"hedge-{provider}")
+
+    def observe(self, chars, latency):
+        """Record one completed request's latency"""
+        predicted = self.model.predict(chars)
+        if predicted > 0:
+            with self._lock:
+                self.ratios.append(latency / predicted)
+
+    def delay(self, chars):
+        """Seconds to wait before sending a duplicate of a request of `chars` characters"""
+        with self._lock:
+            ratios = list(self.ratios)
+        if len(ratios) < MIN_SAMPLES:
+            return self.model.predict(chars) * INITIAL_SLOWDOWN
+        return self.model.predict(chars) * _percentile(ratios, self.percentile)
+
+    def call(self, send, chars=0, limiter=None):
+        """Call send(), firing one duplicate if it runs past the hedge delay
+
+        The first 200 response wins and the other request is discarded. If
+        neither succeeds, the last response is returned (or the first
+        connection error raised) so the caller's retry logic still applies.
+        """
+        with self._lock:
+            self.requests += 1
+
+        primary = self._executor.submit(send)
+        try:
+            return primary.result(timeout=self.delay(chars))
+        except TimeoutError:
+            pass
+
+        # The duplicate spends request/character budget but shares the primary's concurrency slot
+        if limiter:
+            limiter.charge(chars)
+        duplicate = self._executor.submit(send)
+        with self._lock:
+            self.hedged += 1
+
+        pending = {primary, duplicate}
+        fallback = None
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    response = future.result()
+                except requests.exceptions.RequestException as e:
+                    error = error or e
+                    continue
+                if response.status_code == 200:
+                    for other in pending:
+                        _discard(other)
+                    if future is duplicate:
+                        with self._lock:
+                            self.hedge_wins += 1
+                    return response
+                if fallback is not None:
+                    fallback.close()
+                fallback = response
+
+        if fallback is not None:
+            return fallback
+        raise error
+
+    def print_stats(self):
+        if not self.requests:
+            return
+        share = self.hedged / self.requests * 100
+        print(f"🪞 Hedging ({self.provider}, p{self.percentile:g}): {self.hedged} extra requests "
+              f"for {self.requests} calls ({share:.1f}%), {self.hedge_wins} answered first")
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Record/replay HTTP layer for offline, deterministic runs
+In record mode every provider response is captured into a compact fixture
+file as it passes through the clients' pooled sessions; in replay mode the
+same requests are answered from that file without touching the network (or
+needing API keys), optionally sleeping for each response's recorded latency.
+Everything downstream - batching, base64 decoding, caching, concatenation,
+file I/O - runs exactly as it does live.
+
+    TTS_HTTP_MODE=record|replay    unset = live requests
+    TTS_FIXTURES=tts_fixtures.tsf  fixture file
+    TTS_REPLAY_LATENCY=1.0         replay at this multiple of the recorded latency (default 0: instant)
+
+Usage:
+    TTS_HTTP_MODE=record python rime_full.py
+    TTS_HTTP_MODE=replay TTS_REPLAY_LATENCY=1 python rime_full.py
+    python http_replay.py list
+"""
+
+import io
+import os
+import sys
+import json
+import mmap
+import time
+import struct
+import hashlib
+import argparse
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+DEFAULT_FIXTURES = "tts_fixtures.tsf"
+FIXTURE_MAGIC = b"TSFIX1\n"
+MODES = ("record", "replay")
+
+# request digest, status, latency (µs), content type length, body length (then content type & body)
+RECORD = struct.Struct("<32sHIHI")
+
+class FixtureMissing(requests.exceptions.RequestException):
+    """Replay mode met a request that was never recorded
+
+    Fails just that request: unlike connection errors it is neither retried nor
+    counted as throttling, so the limiter slot is handed straight back.
+    """
+
+def request_digest(request):
+    """Key for a request: method, path & query, and its body with JSON keys sorted
+
+    The host and headers (API keys) are left out, so fixtures recorded against
+    the real APIs replay whatever URL the clients are configured with.
+    """
+    url = urlsplit(request.url)
+    body = request.body or b""
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    try:
+        body = json.dumps(json.loads(body), sort_keys=True, ensure_ascii=False).encode("utf-8")
+    except ValueError:
+        pass
+    target = f"{request.method} {url.path}?{url.query}".encode("utf-8")
+    return hashlib.sha256(target + b"\n" + body).digest()
+
+class Fixture:
+    """One recorded response; body is a slice of the store's mmap"""
+
+    __slots__ = ("status", "latency", "content_type", "offset", "length")
+
+    def __init__(self, status, latency, content_type, offset, length):
+        self.status = status
+        self.latency = latency
+        self.content_type = content_type
+        self.offset = offset
+        self.length = length
+
+class FixtureStore:
+    """Append-only file of recorded responses, indexed by request digest on open"""
+
+    def __init__(self, path=DEFAULT_FIXTURES, writable=False):
+        self.path = path
+        self.fixtures = {}
+        self._lock = threading.Lock()
+        self._map = None
+        if writable and not os.path.exists(path):
+            with open(path, 'wb') as f:
+                f.write(FIXTURE_MAGIC)
+        self._file = open(path, 'r+b' if writable else 'rb')
+        self._load()
+
+    def _load(self):
+        data = self._mapping()
+        if data[:len(FIXTURE_MAGIC)] != FIXTURE_MAGIC:
+            raise ValueError(f"{self.path} is not a fixture file")
+
+        position = len(FIXTURE_MAGIC)
+        while position + RECORD.size <= len(data):
+            digest, status, latency_us, type_length, body_length = RECORD.unpack_from(data, position)
+            offset = position + RECORD.size + type_length
+            if offset + body_length > len(data):
+                break  # Partially written record from an interrupted run
+            content_type = bytes(data[position + RECORD.size:offset]).decode("utf-8")
+            # A request recorded twice keeps its latest response
+            self.fixtures[digest] = Fixture(status, latency_us / 1e6, content_type, offset, body_length)
+            position = offset + body_length
+
+    def _mapping(self):
+        size = os.fstat(self._file.fileno()).st_size
+        if self._map is None or len(self._map) < size:
+            if self._map is not None:
+                self._map.close()  # Bodies are handed out as copies, so nothing still points into it
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map
+
+    def __len__(self):
+        return len(self.fixtures)
+
+    def get(self, digest):
+        """(Fixture, body bytes) for a request digest, or (None, None)"""
+        fixture = self.fixtures.get(digest)
+        if fixture is None:
+            return None, None
+        with self._lock:
+            data = self._mapping()
+        return fixture, data[fixture.offset:fixture.offset + fixture.length]
+
+    def add(self, digest, status, latency, content_type, body):
+        content_type_bytes = (content_type or "").encode("utf-8")
+        with self._lock:
+            self._file.seek(0, os.SEEK_END)
+            position = self._file.tell()
+            self._file.write(RECORD.pack(digest, status, min(int(latency * 1e6), 0xFFFFFFFF),
+                                         len(content_type_bytes), len(body)))
+            self._file.write(content_type_bytes)
+            self._file.write(body)
+            self._file.flush()
+            offset = position + RECORD.size + len(content_type_bytes)
+            self.fixtures[digest] = Fixture(status, latency, content_type or "", offset, len(body))
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+def build_response(request, status, content_type, body):
+    """A requests.Response serving body, readable whole or through iter_content"""
+    response = requests.Response()
+    response.status_code = status
+    response.reason = "Replayed"
+    response.headers = CaseInsensitiveDict({"Content-Type": content_type, "Content-Length": str(len(body))})
+    response.encoding = get_encoding_from_headers(response.headers)
+    response.raw = io.BytesIO(body)
+    response.url = request.url
+    response.request = request
+    return response
+
+class RecordingAdapter(HTTPAdapter):
+    """Sends requests for real and stores every response (with its latency) in a FixtureStore"""
+
+    def __init__(self, store, **kwargs):
+        self.store = store
+        super().__init__(**kwargs)
+
+    def send(self, request, stream=False, **kwargs):
+        start = time.perf_counter()
+        response = super().send(request, stream=stream, **kwargs)
+        body = response.content  # Whole body, so its transfer time is part of the latency
+        self.store.add(request_digest(request), response.status_code, time.perf_counter() - start,
+                       response.headers.get("Content-Type"), body)
+        return response
+
+class ReplayAdapter(BaseAdapter):
+    """Answers requests from a FixtureStore, optionally after their recorded latency"""
+
+    def __init__(self, store, latency_scale=0.0):
+        super().__init__()
+        self.store = store
+        self.latency_scale = latency_scale
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        fixture, body = self.store.get(request_digest(request))
+        if fixture is None:
+            raise FixtureMissing(f"No recorded response for {request.method} {urlsplit(request.url).path} "
+                                 f"in {self.store.path}; record it first with TTS_HTTP_MODE=record",
+                                 request=request)
+        if self.latency_scale:
+            time.sleep(fixture.latency * self.latency_scale)
+        response = build_response(request, fixture.status, fixture.content_type, body)
+        response.connection = self
+        return response
+
+    def close(self):
+        pass
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def http_mode():
+    """"record", "replay" or None (live), from TTS_HTTP_MODE"""
+    mode = os.getenv('TTS_HTTP_MODE', "").lower() or None
+    if mode is not None and mode not in MODES:
+        raise ValueError(f"TTS_HTTP_MODE must be one of {', '.join(MODES)}")
+    return mode
+
+def adapter_from_env(pool_size):
+    """Recording or replaying transport adapter configured by TTS_HTTP_MODE, or None when live"""
+    mode = http_mode()
+    if mode is None:
+        return None
+
+    path = os.getenv('TTS_FIXTURES', DEFAULT_FIXTURES)
+    with _stores_lock:
+        # One store per file, shared by every provider's session
+        store = _stores.get(path)
+        if store is None:
+            store = _stores[path] = FixtureStore(path, writable=(mode == "record"))
+    if mode == "record":
+        return RecordingAdapter(store, pool_connections=1, pool_maxsize=pool_size)
+    return ReplayAdapter(store, float(os.getenv('TTS_REPLAY_LATENCY', 0) or 0))
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Inspect a recorded HTTP fixture file")
+    parser.add_argument("command", choices=["list"])
+    parser.add_argument("--fixtures", default=os.getenv('TTS_FIXTURES', DEFAULT_FIXTURES))
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not os.path.exists(args.fixtures):
+        print(f"❌ No fixtures at {args.fixtures}; record some with TTS_HTTP_MODE=record")
+        return False
+
+    store = FixtureStore(args.fixtures)
+    total = 0
+    for digest, fixture in store.fixtures.items():
+        total += fixture.length
+        print(f"{digest.hex()[:16]}  {fixture.status}  {fixture.latency * 1000:8.1f} ms  "
+              f"{fixture.length:>9} bytes  {fixture.content_type}")
+    print(f"{len(store)} responses, {total / 1024 / 1024:.2f} MB")
+    store.close()
+    return True
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Incremental regeneration of the combined word-list outputs
+Every run records which words each segment (request) of its combined MP3
+covers and where that segment's frames sit in the file. The next run diffs
+its word list against that record, synthesizes only words that are new,
+changed or moved out of their old segment, and splices the new audio in
+between byte-for-byte copies of the untouched segments - nothing is
+re-encoded or re-requested.
+"""
+
+import os
+import json
+import hashlib
+from collections import namedtuple
+
+from mp3_concat import extract_audio_frames
+from run_journal import DEFAULT_JOURNAL_DIR
+from instrumentation import span
+
+# Largest segment --incremental creates; smaller segments mean less is redone when
+# a word is inserted or edited in the middle of the list, at the cost of more requests
+DEFAULT_SEGMENT_CHARS = 200
+
+# words: tuple of the words it speaks; key: cache key of its request;
+# offset/length: byte range of its frames in the combined output
+Segment = namedtuple("Segment", ["words", "key", "offset", "length"])
+
+def record_path(output_file, root=DEFAULT_JOURNAL_DIR):
+    """Where the segment record for output_file is kept"""
+    return os.path.join(root, os.path.basename(output_file) + ".segments.json")
+
+def file_sha256(path):
+    """SHA-256 of a file's contents, read in blocks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def load_segments(output_file, settings=None, root=DEFAULT_JOURNAL_DIR):
+    """Segments recorded for output_file by the previous run
+
+    Returns [] if there is no record, the output was modified or removed
+    since, or it was produced with different settings (e.g. post-processing).
+    """
+    path = record_path(output_file, root)
+    if not os.path.exists(path) or not os.path.exists(output_file):
+        return []
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            record = json.load(f)
+    except (OSError, ValueError):
+        return []
+
+    if record.get("settings") != settings or record.get("sha256") != file_sha256(output_file):
+        return []
+    return [Segment(tuple(s["words"]), s["key"], s["offset"], s["length"]) for s in record["segments"]]
+
+def plan_segments(words, segments, segment_key):
+    """Match the previous run's segments against the new word list
+
+    A segment is reused where its words appear contiguously in `words` and
+    segment_key(words) still gives its recorded key (so a changed voice or
+    model invalidates it). Returns the new list in order as a mix of reused
+    Segments and lists of words that need synthesizing.
+    """
+    by_first_word = {}
+    for index, segment in enumerate(segments):
+        if segment.words and segment_key(list(segment.words)) == segment.key:
+            by_first_word.setdefault(segment.words[0], []).append((index, segment))
+
+    plan = []
+    pending = []
+    used = set()
+    i = 0
+    while i < len(words):
+        match = None
+        for index, segment in by_first_word.get(words[i], ()):
+            n = len(segment.words)
+            if (index not in used and tuple(words[i:i + n]) == segment.words
+                    and (match is None or n > len(match[1].words))):
+                match = index, segment
+        if match is None:
+            pending.append(words[i])
+            i += 1
+            continue
+
+        if pending:
+            plan.append(pending)
+            pending = []
+        index, segment = match
+        used.add(index)
+        plan.append(segment)
+        i += len(segment.words)
+
+    if pending:
+        plan.append(pending)
+    return plan
+
+def schedule_batches(plan, make_batches):
+    """Batch the runs of new words in a plan
+
+    make_batches(words) splits one run into request-sized batches. Returns
+    (layout, batches): layout lists the output in order as reused Segments
+    or indexes into batches, the new requests to make.
+    """
+    layout = []
+    batches = []
+    for item in plan:
+        if isinstance(item, Segment):
+            layout.append(item)
+            continue
+        for batch in make_batches(item):
+            layout.append(len(batches))
+            batches.append(batch)
+    return layout, batches
+
+def reused_words(plan):
+    """Number of words a plan takes from the previous output"""
+    return sum(len(item.words) for item in plan if isinstance(item, Segment))
+
+def splice_output(layout, batches, batch_audio, output_file, segment_key, settings=None,
+                  root=DEFAULT_JOURNAL_DIR):
+    """Write output_file from reused segments and new batch audio, then record its segments
+
+    Reused frames are copied from the current output_file, so the new file is
+    written alongside and moved into place at the end.
+    """
+    previous = b""
+    if any(isinstance(item, Segment) for item in layout):
+        with open(output_file, 'rb') as f:
+            previous = f.read()
+
+    segments = []
+    temp_file = output_file + ".tmp"
+    digest = hashlib.sha256()
+    with span("splice_output", file=output_file) as s, open(temp_file, 'wb') as f:
+        for item in layout:
+            if isinstance(item, Segment):
+                words, key = item.words, item.key
+                frames = previous[item.offset:item.offset + item.length]
+            else:
+                words, key = batches[item], segment_key(batches[item])
+                frames = extract_audio_frames(batch_audio[item])
+            segments.append({"words": list(words), "key": key, "offset": f.tell(), "length": len(frames)})
+            f.write(frames)
+            digest.update(frames)
+        s.set(bytes=f.tell(), reused=sum(isinstance(item, Segment) for item in layout))
+    os.replace(temp_file, output_file)
+
+    os.makedirs(root, exist_ok=True)
+    with open(record_path(output_file, root), 'w', encoding='utf-8') as f:
+        json.dump({"output": os.path.basename(output_file), "sha256": digest.hexdigest(),
+                   "settings": settings, "segments": segments}, f, ensure_ascii=False)
+    return segments
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Phase-level timing instrumentation
+Records a span (duration, bytes, characters) for every phase and request -
+loading words, batching, HTTP waits, decoding, file writes, post-processing -
+and exports them as JSON lines and a Prometheus text-format file. Everything
+is off (and spans cost next to nothing) unless one of these is set:
+
+    TTS_TRACE_FILE=trace.jsonl     every span as one JSON line (appended)
+    TTS_METRICS_FILE=metrics.prom  per-phase totals in Prometheus text format
+    TTS_PROFILE_FILE=run.prof      cProfile of the main thread (view with snakeviz/pstats)
+"""
+
+import os
+import json
+import time
+import uuid
+import atexit
+import cProfile
+import threading
+from contextlib import contextmanager
+
+class Span:
+    """One timed phase; attributes such as bytes, chars or status can be added while it runs"""
+
+    __slots__ = ("name", "start", "duration", "attrs")
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.start = time.time()
+        self.duration = 0.0
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+class _NullSpan:
+    """Stand-in yielded when instrumentation is off"""
+
+    def set(self, **attrs):
+        pass
+
+_NULL_SPAN = _NullSpan()
+
+class Tracer:
+    """Collects spans for one run and exports them at exit"""
+
+    def __init__(self, trace_file=None, metrics_file=None, profile_file=None):
+        self.trace_file = trace_file
+        self.metrics_file = metrics_file
+        self.profile_file = profile_file
+        self.run_id = uuid.uuid4().hex[:12]
+        self.spans = []
+        self._lock = threading.Lock()
+        self._profiler = None
+
+    @property
+    def enabled(self):
+        return bool(self.trace_file or self.metrics_file)
+
+    @contextmanager
+    def span(self, name, **attrs):
+        if not self.enabled:
+            yield _NULL_SPAN
+            return
+
+        span = Span(name, attrs)
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.set(error=type(e).__name__)
+            raise
+        finally:
+            span.duration = time.perf_counter() - started
+            with self._lock:
+                self.spans.append(span)
+
+    def start_profile(self):
+        if self.profile_file and self._profiler is None:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    def export(self):
+        """Write the trace, metrics and profile files that are configured"""
+        if self._profiler:
+            self._profiler.disable()
+            self._profiler.dump_stats(self.profile_file)
+            self._profiler = None
+
+        with self._lock:
+            spans, self.spans = self.spans, []
+        if not spans:
+            return
+
+        if self.trace_file:
+            with open(self.trace_file, 'a', encoding='utf-8') as f:
+                for span in spans:
+                    record = {"run": self.run_id, "name": span.name, "start": round(span.start, 6),
+                              "duration": round(span.duration, 6), **span.attrs}
+                    f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+
+        if self.metrics_file:
+            with open(self.metrics_file, 'w', encoding='utf-8') as f:
+                f.write(prometheus_text(spans))
+
+def _labels(span):
+    labels = {"phase": span.name}
+    if "provider" in span.attrs:
+        labels["provider"] = span.attrs["provider"]
+    return tuple(sorted(labels.items()))
+
+def _format_labels(labels):
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+def prometheus_text(spans):
+    """Per-phase (and provider) totals in the Prometheus text exposition format"""
+    totals = {}
+    for span in spans:
+        total = totals.setdefault(_labels(span), {"count": 0, "seconds": 0.0, "max": 0.0,
+                                                  "bytes": 0, "chars": 0, "errors": 0})
+        total["count"] += 1
+        total["seconds"] += span.duration
+        total["max"] = max(total["max"], span.duration)
+        total["bytes"] += span.attrs.get("bytes", 0) or 0
+        total["chars"] += span.attrs.get("chars", 0) or 0
+        total["errors"] += 1 if "error" in span.attrs else 0
+
+    metrics = [
+        ("tts_phase_duration_seconds", "summary", "Time spent in each phase", None),
+        ("tts_phase_duration_seconds_max", "gauge", "Slowest single span of each phase", "max"),
+        ("tts_phase_bytes_total", "counter", "Audio bytes handled by each phase", "bytes"),
+        ("tts_phase_chars_total", "counter", "Text characters handled by each phase", "chars"),
+        ("tts_phase_errors_total", "counter", "Spans that ended with an exception", "errors"),
+    ]
+    lines = []
+    for name, kind, help_text, field in metrics:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, total in sorted(totals.items()):
+            label_text = _format_labels(labels)
+            if field is None:
+                lines.append(f"{name}_sum{label_text} {total['seconds']:.6f}")
+                lines.append(f"{name}_count{label_text} {total['count']}")
+            elif field == "max":
+                lines.append(f"{name}{label_text} {total[field]:.6f}")
+            else:
+                lines.append(f"{name}{label_text} {total[field]}")
+    return "\n".join(lines) + "\n"
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+def get_tracer():
+    """Return the process-wide tracer configured from TTS_TRACE_FILE / TTS_METRICS_FILE /
+    TTS_PROFILE_FILE, exporting automatically at exit"""
+    global _tracer
+
+    with _tracer_lock:
+        if _tracer is None:
+            _tracer = Tracer(os.getenv('TTS_TRACE_FILE'), os.getenv('TTS_METRICS_FILE'),
+                             os.getenv('TTS_PROFILE_FILE'))
+            atexit.register(_tracer.export)
+        return _tracer
+
+def span(name, **attrs):
+    """Time a phase: `with span("http_request", provider="rime", chars=42) as s: ... s.set(bytes=n)`"""
+    return get_tracer().span(name, **attrs)
+
+def run_instrumented(main, name):
+    """Run an entry point's main() inside a top-level span, profiling it if configured"""
+    tracer = get_tracer()
+    tracer.start_profile()
+    with tracer.span("run", script=name):
+        return main()
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the RIME.ai and ElevenLabs TTS APIs
+Serves silent MP3 audio with configurable latency so the client pipeline can be
+benchmarked and regression-tested offline, plus the RIME WebSocket endpoint
+when the optional websockets package is installed
+"""
+
+import sys
+import json
+import time
+import base64
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+RIME_CHAR_LIMIT = 500
+CHARS_PER_SECOND = 15  # Roughly natural speaking rate
+
+# Frame headers for silent audio matching each provider's real output format
+RIME_FRAME_HEADER = bytes([0xFF, 0xF3, 0x80, 0xC0])        # MPEG2 L3, 64 kbps, 22050 Hz, mono
+ELEVENLABS_FRAME_HEADER = bytes([0xFF, 0xFB, 0x90, 0xC0])  # MPEG1 L3, 128 kbps, 44100 Hz, mono
+
+def make_silent_mp3(seconds, provider="rime"):
+    """Build a valid MP3 stream of silent frames lasting roughly `seconds`"""
+    if provider == "rime":
+        header, frame_length, frame_seconds = RIME_FRAME_HEADER, 208, 576 / 22050
+    else:
+        header, frame_length, frame_seconds = ELEVENLABS_FRAME_HEADER, 417, 1152 / 44100
+    frame = header + bytes(frame_length - 4)
+    frame_count = max(1, round(seconds / frame_seconds))
+    return frame * frame_count
+
+class LatencyModel:
+    """Response latency: base + per-character cost, scaled by log-normal jitter,
+    with an optional heavy tail"""
+
+    def __init__(self, base_ms=150, per_char_ms=2.0, jitter=0.25, ttfb_ratio=0.3,
+                 tail_prob=0.0, tail_ms=0, seed=None):
+        self.base_ms = base_ms
+        self.per_char_ms = per_char_ms
+        self.jitter = jitter
+        self.ttfb_ratio = ttfb_ratio
+        self.tail_prob = tail_prob
+        self.tail_ms = tail_ms
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self, chars):
+        """Return (time_to_first_byte, total) in seconds for a request of `chars` characters"""
+        with self._lock:
+            scale = self._random.lognormvariate(0, self.jitter) if self.jitter else 1.0
+            tail = self.tail_ms if self._random.random() < self.tail_prob else 0
+        total_ms = (self.base_ms + self.per_char_ms * chars) * scale + tail
+        ttfb_ms = self.base_ms * scale + tail + (total_ms - self.base_ms * scale - tail) * self.ttfb_ratio
+        return ttfb_ms / 1000, total_ms / 1000
+
+class MockTTSHandler(BaseHTTPRequestHandler):
+    """Request handler implementing the RIME JSON and ElevenLabs audio/mpeg endpoints"""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            return json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            return None
+
+    def _send_json(self, status, body):
+        encoded = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(encoded)))
+        self.end_headers()
+        self.wfile.write(encoded)
+
+    def do_POST(self):
+        self.server.request_count += 1
+        data = self._read_json()
+        if self.server.throttle_prob and random.random() < self.server.throttle_prob:
+            self.server.throttled_count += 1
+            encoded = json.dumps({"message": "Too many requests"}).encode("utf-8")
+            self.send_response(429)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Retry-After", str(self.server.retry_after))
+            self.send_header("Content-Length", str(len(encoded)))
+            self.end_headers()
+            self.wfile.write(encoded)
+            return
+        if data is None or not data.get("text"):
+            self._send_json(400, {"message": "Request body must be JSON with non-empty text"})
+            return
+
+        if self.path.rstrip("/").endswith("/rime-tts"):
+            self._handle_rime(data)
+        elif "/text-to-speech/" in self.path:
+            self._handle_elevenlabs(data, stream=self.path.rstrip("/").endswith("/stream"))
+        else:
+            self._send_json(404, {"message": f"Unknown endpoint {self.path}"})
+
+    def _handle_rime(self, data):
+        if not self.headers.get("Authorization", "").startswith("Bearer "):
+            self._send_json(401, {"message": "Missing bearer token"})
+            return
+
+        text = data["text"]
+        if len(text) > RIME_CHAR_LIMIT:
+            self._send_json(400, {"message": f"text must be at most {RIME_CHAR_LIMIT} characters"})
+            return
+
+        _, total = self.server.latency.sample(len(text))
+        time.sleep(total)
+
+        audio = make_silent_mp3(len(text) / CHARS_PER_SECOND, "rime")
+        self._send_json(200, {"audioContent": base64.b64encode(audio).decode("ascii")})
+
+    def _handle_elevenlabs(self, data, stream):
+        if not self.headers.get("xi-api-key"):
+            self._send_json(401, {"detail": {"status": "invalid_api_key"}})
+            return
+
+        text = data["text"]
+        ttfb, total = self.server.latency.sample(len(text))
+        audio = make_silent_mp3(len(text) / CHARS_PER_SECOND, "elevenlabs")
+
+        if not stream:
+            time.sleep(total)
+            self.send_response(200)
+            self.send_header("Content-Type", "audio/mpeg")
+            self.send_header("Content-Length", str(len(audio)))
+            self.end_headers()
+            self.wfile.write(audio)
+            return
+
+        # Stream in chunks, spreading the remaining latency over the body
+        time.sleep(ttfb)
+        self.send_response(200)
+        self.send_header("Content-Type", "audio/mpeg")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        chunk_size = 4096
+        chunks = [audio[i:i + chunk_size] for i in range(0, len(audio), chunk_size)]
+        delay = max(total - ttfb, 0) / max(len(chunks), 1)
+        for i, chunk in enumerate(chunks):
+            if i:
+                time.sleep(delay)
+            self.wfile.write(f"{len(chunk):X}\r\n".encode("ascii") + chunk + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+class MockTTSServer(ThreadingHTTPServer):
+    """Threaded HTTP server holding the latency model and request counter"""
+
+    daemon_threads = True
+
+    def __init__(self, address, latency=None, verbose=False, throttle_prob=0.0, retry_after=1):
+        super().__init__(address, MockTTSHandler)
+        self.latency = latency or LatencyModel()
+        self.verbose = verbose
+        self.throttle_prob = throttle_prob
+        self.retry_after = retry_after
+        self.request_count = 0
+        self.throttled_count = 0
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def rime_url(self):
+        return f"{self.base_url}/v1/rime-tts"
+
+    @property
+    def elevenlabs_url(self):
+        return f"{self.base_url}/v1/text-to-speech"
+
+def start_mock_server(host="127.0.0.1", port=0, latency=None, verbose=False,
+                      throttle_prob=0.0, retry_after=1):
+    """Start the mock server on a background thread and return it
+
+    Pass port=0 to pick a free port; call server.shutdown() when finished.
+    """
+    server = MockTTSServer((host, port), latency, verbose, throttle_prob, retry_after)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+def handle_rime_ws(connection, latency):
+    """Serve one RIME WebSocket connection: synthesize each flushed context in order"""
+    if not connection.request.headers.get("Authorization", "").startswith("Bearer "):
+        connection.close(1008, "Missing bearer token")
+        return
+
+    texts = {}
+    for message in connection:
+        try:
+            data = json.loads(message)
+        except json.JSONDecodeError:
+            connection.send(json.dumps({"type": "error", "message": "Messages must be JSON"}))
+            continue
+
+        context_id = data.get("contextId")
+        if "text" in data:
+            texts[context_id] = texts.get(context_id, "") + data["text"]
+            continue
+        if data.get("operation") != "flush":
+            continue
+
+        text = texts.pop(context_id, "")
+        if not text or len(text) > RIME_CHAR_LIMIT:
+            connection.send(json.dumps({"type": "error", "contextId": context_id,
+                                        "message": f"text must be 1-{RIME_CHAR_LIMIT} characters"}))
+            continue
+
+        _, total = latency.sample(len(text))
+        time.sleep(total)
+        audio = make_silent_mp3(len(text) / CHARS_PER_SECOND, "rime")
+        for i in range(0, len(audio), 4096):
+            connection.send(json.dumps({"type": "chunk", "contextId": context_id,
+                                        "data": base64.b64encode(audio[i:i + 4096]).decode("ascii")}))
+        connection.send(json.dumps({"type": "done", "contextId": context_id}))
+
+def start_mock_ws_server(host="127.0.0.1", port=0, latency=None):
+    """Start the RIME WebSocket stand-in on a background thread and return it
+
+    Needs the optional websockets package. The URL is ws://host:port/ws2;
+    call server.shutdown() when finished.
+    """
+    from websockets.sync.server import serve
+
+    latency = latency or LatencyModel()
+    server = serve(lambda connection: handle_rime_ws(connection, latency), host, port, max_size=None)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+def add_latency_arguments(parser):
+    """Add latency model options to an argument parser"""
+    parser.add_argument("--base-ms", type=float, default=150, help="Fixed latency per request")
+    parser.add_argument("--per-char-ms", type=float, default=2.0, help="Extra latency per character")
+    parser.add_argument("--jitter", type=float, default=0.25, help="Log-normal sigma applied to latency")
+    parser.add_argument("--ttfb-ratio", type=float, default=0.3,
+                        help="Share of synthesis time spent before the first streamed byte")
+    parser.add_argument("--tail-prob", type=float, default=0.0, help="Probability of a slow outlier")
+    parser.add_argument("--tail-ms", type=float, default=0, help="Extra latency added to outliers")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for reproducible latency")
+
+def latency_from_args(args):
+    """Build a LatencyModel from parsed latency options"""
+    return LatencyModel(args.base_ms, args.per_char_ms, args.jitter, args.ttfb_ratio,
+                        args.tail_prob, args.tail_ms, args.seed)
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local mock RIME.ai / ElevenLabs TTS server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    parser.add_argument("--throttle-prob", type=float, default=0.0,
+                        help="Probability of answering 429 Too Many Requests")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--ws-port", type=int, default=8766,
+                        help="Port for the RIME WebSocket endpoint (0 to disable)")
+    add_latency_arguments(parser)
+    args = parser.parse_args()
+
+    latency = latency_from_args(args)
+    server = MockTTSServer((args.host, args.port), latency, args.verbose,
+                           args.throttle_prob, args.retry_after)
+    print(f"🧪 Mock TTS server listening on {server.base_url}")
+    print(f"   RIME:       export RIME_API_URL={server.rime_url}")
+    print(f"   ElevenLabs: export ELEVENLABS_API_URL={server.elevenlabs_url}")
+    if args.ws_port:
+        try:
+            start_mock_ws_server(args.host, args.ws_port, latency)
+            print(f"   RIME WS:    export RIME_WS_URL=ws://{args.host}:{args.ws_port}/ws2")
+        except ImportError:
+            print("   RIME WS:    disabled (pip install websockets)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopping mock server")
+        server.server_close()
+        sys.exit(0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Native MP3 concatenation without ffmpeg
+Parses MPEG audio frame headers, drops ID3 tags & Xing/Info/VBRI header frames,
+and joins the remaining audio frames into a single stream in memory
+"""
+
+from collections import namedtuple
+
+from instrumentation import span
+
+FrameHeader = namedtuple(
+    "FrameHeader",
+    ["version", "layer", "bitrate", "sample_rate", "padding", "protected",
+     "channels", "frame_length", "samples"],
+)
+
+# Bitrates in kbps, indexed by bitrate index (0 = free format, 15 = invalid)
+BITRATES = {
+    (1, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (1, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (1, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (2, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (2, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (2, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+
+# Sample rates in Hz, indexed by MPEG version (1, 2, 2.5)
+SAMPLE_RATES = {
+    1: [44100, 48000, 32000],
+    2: [22050, 24000, 16000],
+    2.5: [11025, 12000, 8000],
+}
+
+VERSION_BITS = {0: 2.5, 2: 2, 3: 1}
+LAYER_BITS = {1: 3, 2: 2, 3: 1}
+
+def parse_frame_header(data, pos):
+    """Parse the 4-byte MPEG audio frame header at pos, or return None if invalid"""
+    if pos + 4 > len(data):
+        return None
+
+    b1, b2, b3 = data[pos + 1], data[pos + 2], data[pos + 3]
+    if data[pos] != 0xFF or (b1 & 0xE0) != 0xE0:
+        return None
+
+    version = VERSION_BITS.get((b1 >> 3) & 0x03)
+    layer = LAYER_BITS.get((b1 >> 1) & 0x03)
+    bitrate_index = b2 >> 4
+    sample_rate_index = (b2 >> 2) & 0x03
+    if version is None or layer is None:
+        return None
+    # Free-format and invalid bitrates can't be framed without decoding
+    if bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+
+    table_version = 1 if version == 1 else 2
+    bitrate = BITRATES[(table_version, layer)][bitrate_index] * 1000
+    sample_rate = SAMPLE_RATES[version][sample_rate_index]
+    padding = (b2 >> 1) & 0x01
+    channels = 1 if (b3 >> 6) == 3 else 2
+
+    if layer == 1:
+        samples = 384
+        frame_length = (12 * bitrate // sample_rate + padding) * 4
+    elif layer == 3 and version != 1:
+        samples = 576
+        frame_length = 72 * bitrate // sample_rate + padding
+    else:
+        samples = 1152
+        frame_length = 144 * bitrate // sample_rate + padding
+
+    return FrameHeader(version, layer, bitrate, sample_rate, padding,
+                       not (b1 & 0x01), channels, frame_length, samples)
+
+def _id3v2_length(data, pos):
+    """Return the total size of an ID3v2 tag starting at pos (header + body + footer)"""
+    if pos + 10 > len(data):
+        return len(data) - pos
+    flags = data[pos + 5]
+    size = 0
+    for byte in data[pos + 6:pos + 10]:
+        size = (size << 7) | (byte & 0x7F)  # syncsafe integer
+    footer = 10 if flags & 0x10 else 0
+    return 10 + size + footer
+
+def is_vbr_header_frame(data, pos, header):
+    """Check whether the frame at pos is a Xing/Info/VBRI header rather than audio"""
+    if header.layer != 3:
+        return False
+
+    # Xing/Info tag sits right after the side information
+    if header.version == 1:
+        side_info = 17 if header.channels == 1 else 32
+    else:
+        side_info = 9 if header.channels == 1 else 17
+    offset = pos + 4 + (2 if header.protected else 0) + side_info
+    if data[offset:offset + 4] in (b"Xing", b"Info"):
+        return True
+
+    # VBRI tag is always 32 bytes after the header
+    return data[pos + 36:pos + 40] == b"VBRI"
+
+def iter_frames(data):
+    """Yield (offset, header) for every audio frame, skipping tags and junk"""
+    pos = 0
+    length = len(data)
+
+    while pos + 4 <= length:
+        if data[pos:pos + 3] == b"ID3":
+            pos += _id3v2_length(data, pos)
+            continue
+        if data[pos:pos + 3] == b"TAG" and pos + 128 <= length:
+            pos += 128  # ID3v1 tag
+            continue
+
+        header = parse_frame_header(data, pos)
+        if header is None or header.frame_length < 4 or pos + header.frame_length > length:
+            pos += 1  # Resync on the next byte
+            continue
+
+        yield pos, header
+        pos += header.frame_length
+
+def extract_audio_frames(data):
+    """Return only the audio frames of an MP3 buffer, without tags or VBR headers"""
+    frames = []
+    first = True
+    for pos, header in iter_frames(data):
+        if first and is_vbr_header_frame(data, pos, header):
+            first = False
+            continue
+        first = False
+        frames.append(data[pos:pos + header.frame_length])
+    return b"".join(frames)
+
+def mp3_duration(data):
+    """Return the playback duration of an MP3 buffer in seconds"""
+    duration = 0.0
+    first = True
+    for pos, header in iter_frames(data):
+        if first and is_vbr_header_frame(data, pos, header):
+            first = False
+            continue
+        first = False
+        duration += header.samples / header.sample_rate
+    return duration
+
+def concatenate_mp3(buffers):
+    """Join several MP3 byte buffers into one continuous MP3 stream"""
+    return b"".join(extract_audio_frames(buffer) for buffer in buffers)
+
+def write_concatenated_mp3(buffers, output_file):
+    """Concatenate MP3 byte buffers straight into output_file"""
+    with span("write_output", file=output_file) as s, open(output_file, 'wb') as f:
+        written = 0
+        for buffer in buffers:
+            frames = extract_audio_frames(buffer)
+            f.write(frames)
+            written += len(frames)
+        s.set(bytes=written)
+    return output_file
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Multi-process audio post-processing
+Trims leading/trailing silence, normalizes loudness and transcodes every
+utterance to one common MP3 format so providers are compared on equal terms.
+The CPU-bound work fans out over a process pool; results stream back in order
+with a cap on how many clips are in flight at once.
+
+Usage:
+    python post_process.py rime_all_words_full.mp3 elevenlabs_all_words.mp3 -o processed/
+"""
+
+import io
+import os
+import sys
+import argparse
+import multiprocessing
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from instrumentation import span
+
+PostProcessOptions = namedtuple("PostProcessOptions", [
+    "target_dbfs",      # Average loudness every clip is normalized to
+    "silence_dbfs",     # Level below which leading/trailing audio is trimmed
+    "pad_ms",           # Silence kept at each end so words don't run together
+    "sample_rate",
+    "channels",
+    "bitrate",
+])
+
+DEFAULT_OPTIONS = PostProcessOptions(
+    target_dbfs=-20.0,
+    silence_dbfs=-50.0,
+    pad_ms=100,
+    sample_rate=44100,
+    channels=1,
+    bitrate="128k",
+)
+
+def process_clip(audio_bytes, options=DEFAULT_OPTIONS):
+    """Trim, normalize and transcode one MP3 clip, returning the new MP3 bytes
+
+    Runs in worker processes, so pydub is imported here rather than at module
+    level (it warns on import when ffmpeg is missing).
+    """
+    from pydub import AudioSegment
+    from pydub.silence import detect_leading_silence
+
+    segment = AudioSegment.from_file(io.BytesIO(audio_bytes), format="mp3", codec="mp3")
+    segment = segment.set_channels(options.channels).set_frame_rate(options.sample_rate)
+
+    # Trim silence at both ends, keeping a little padding
+    start = detect_leading_silence(segment, options.silence_dbfs)
+    end = len(segment) - detect_leading_silence(segment.reverse(), options.silence_dbfs)
+    if end > start:
+        segment = segment[max(start - options.pad_ms, 0):min(end + options.pad_ms, len(segment))]
+
+    # Fully silent clips have -inf dBFS and are left as they are
+    if segment.dBFS != float("-inf"):
+        segment = segment.apply_gain(options.target_dbfs - segment.dBFS)
+
+    output = io.BytesIO()
+    segment.export(output, format="mp3", bitrate=options.bitrate)
+    return output.getvalue()
+
+def process_clips(clips, options=DEFAULT_OPTIONS, workers=None, max_in_flight=None):
+    """Process clips over a process pool, yielding results in input order
+
+    At most max_in_flight clips (default: 2 per worker) are submitted or
+    waiting to be consumed at once, so memory stays bounded however many
+    clips there are. Worker exceptions are raised when their clip is reached.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or workers * 2
+
+    # Spawned rather than forked: callers may be running synthesis threads
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        pending = deque()
+        for clip in clips:
+            if len(pending) >= max_in_flight:
+                yield pending.popleft().result()
+            pending.append(executor.submit(process_clip, clip, options))
+        while pending:
+            yield pending.popleft().result()
+
+def post_process_clips(clips, options=DEFAULT_OPTIONS, workers=None):
+    """Process a list of clips, returning the processed list or None on failure"""
+    print(f"🎛️ Post-processing {len(clips)} clips on {workers or os.cpu_count()} processes...")
+    try:
+        with span("post_process", clips=len(clips), bytes=sum(len(clip) for clip in clips)):
+            return list(process_clips(clips, options, workers))
+    except Exception as e:
+        print(f"❌ Post-processing failed: {e}")
+        return None
+
+def post_process_file(path, options=DEFAULT_OPTIONS):
+    """Post-process an MP3 file in place, returning True on success"""
+    with open(path, 'rb') as f:
+        audio_bytes = f.read()
+    try:
+        with span("post_process", clips=1, bytes=len(audio_bytes)):
+            processed = process_clip(audio_bytes, options)
+    except Exception as e:
+        print(f"❌ Post-processing {path} failed: {e}")
+        return False
+    with open(path, 'wb') as f:
+        f.write(processed)
+    return True
+
+def add_post_process_arguments(parser):
+    """Add post-processing options to an argument parser"""
+    parser.add_argument("--target-dbfs", type=float, default=DEFAULT_OPTIONS.target_dbfs,
+                        help="Loudness every clip is normalized to")
+    parser.add_argument("--silence-dbfs", type=float, default=DEFAULT_OPTIONS.silence_dbfs,
+                        help="Level below which leading/trailing audio is trimmed")
+    parser.add_argument("--sample-rate", type=int, default=DEFAULT_OPTIONS.sample_rate,
+                        help="Output sample rate for every provider")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+
+def options_from_args(args):
+    """Build PostProcessOptions from parsed post-processing options"""
+    return DEFAULT_OPTIONS._replace(target_dbfs=args.target_dbfs, silence_dbfs=args.silence_dbfs,
+                                    sample_rate=args.sample_rate)
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Trim, normalize and transcode MP3 files in parallel")
+    parser.add_argument("files", nargs="+", help="MP3 files to process")
+    parser.add_argument("-o", "--output-dir", default="processed", help="Directory for processed files")
+    add_post_process_arguments(parser)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    def read_all():
+        for path in args.files:
+            with open(path, 'rb') as f:
+                yield f.read()
+
+    try:
+        results = process_clips(read_all(), options_from_args(args), args.workers)
+        for path, processed in zip(args.files, results):
+            output = os.path.join(args.output_dir, os.path.basename(path))
+            with open(output, 'wb') as f:
+                f.write(processed)
+            print(f"✅ {path} -> {output}")
+    except Exception as e:
+        print(f"❌ Post-processing failed: {e}")
+        return False
+    return True
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Per-provider rate limiting, adaptive concurrency & retry with backoff
+Keeps each provider at its quota ceiling without tripping 429s
+"""
+
+import time
+import random
+import threading
+from email.utils import parsedate_to_datetime
+
+import requests
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, bursts up to `capacity`"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, amount=1):
+        """Block until `amount` tokens are available, then take them"""
+        # Requests larger than the bucket would never fit, so let them drain it instead
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                wait = (amount - self._tokens) / self.rate
+            time.sleep(wait)
+
+class AdaptiveConcurrency:
+    """AIMD concurrency limit: grows by ~1 per window of successes,
+    shrinks multiplicatively on throttling or server errors"""
+
+    def __init__(self, initial=4, minimum=1, maximum=32, decrease=0.5):
+        self.limit = float(min(max(initial, minimum), maximum))
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease = decrease
+        self.in_flight = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self, throttled=False):
+        with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(self.minimum, self.limit * self.decrease)
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+class ProviderLimiter:
+    """Request-rate, character-rate and concurrency limits for one provider"""
+
+    def __init__(self, requests_per_sec=None, chars_per_min=None,
+                 initial_concurrency=4, max_concurrency=32):
+        self.request_bucket = TokenBucket(requests_per_sec) if requests_per_sec else None
+        self.char_bucket = TokenBucket(chars_per_min / 60, chars_per_min) if chars_per_min else None
+        self.concurrency = AdaptiveConcurrency(initial_concurrency, maximum=max_concurrency)
+        self.throttled = 0
+        self.retries = 0
+
+    def acquire(self, chars=0):
+        """Wait for a concurrency slot and enough request/character budget"""
+        self.concurrency.acquire()
+        if self.request_bucket:
+            self.request_bucket.acquire()
+        if self.char_bucket and chars:
+            self.char_bucket.acquire(chars)
+
+    def charge(self, chars=0):
+        """Spend request/character budget without taking a concurrency slot"""
+        if self.request_bucket:
+            self.request_bucket.acquire()
+        if self.char_bucket and chars:
+            self.char_bucket.acquire(chars)
+
+    def release(self, throttled=False):
+        if throttled:
+            self.throttled += 1
+        self.concurrency.release(throttled)
+
+def retry_after_seconds(response):
+    """Parse a Retry-After header (seconds or HTTP date), or return None"""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+def backoff_delay(attempt, base_delay=0.5, max_delay=30.0):
+    """Full-jitter exponential backoff for the given retry attempt (0-based)"""
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+def send_with_retry(send, limiter=None, chars=0, max_retries=4, base_delay=0.5, max_delay=30.0):
+    """Call send() under the limiter, retrying 429/5xx and connection errors
+
+    Retry-After is honoured when the provider sends it; otherwise the delay is
+    jittered exponential backoff. The last response (or exception) is returned
+    (or raised) once retries are exhausted.
+    """
+    attempt = 0
+    while True:
+        if limiter:
+            limiter.acquire(chars)
+
+        # The slot is released however send() ends, so an unexpected error can't leak it
+        throttled = False
+        try:
+            response = send()
+            throttled = response.status_code in RETRY_STATUS_CODES
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            throttled = True
+            if attempt >= max_retries:
+                raise
+            delay = backoff_delay(attempt, base_delay, max_delay)
+        else:
+            if not throttled or attempt >= max_retries:
+                return response
+            delay = retry_after_seconds(response)
+            if delay is None:
+                delay = backoff_delay(attempt, base_delay, max_delay)
+            response.close()
+        finally:
+            if limiter:
+                limiter.release(throttled=throttled)
+
+        if limiter:
+            limiter.retries += 1
+        print(f"⏳ Retrying in {delay:.1f}s (attempt {attempt + 2}/{max_retries + 1})")
+        time.sleep(delay)
+        attempt += 1
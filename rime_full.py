@@ -1,136 +1,187 @@
 #!/usr/bin/env python3
 """
 RIME.ai TTS script for ALL challenging commercial words
-Simple approach: process in batches, save separate files, then use ffmpeg to concatenate
+Simple approach: process in batches, then join the MP3 frames into a single file
 """
 
 import os
 import sys
-import requests
+import time
+import argparse
 import json
-import base64
-import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from tts_cache import get_default_cache
+from tts_client import get_client, get_api_key
+from rime_ws import websocket_available
+from scheduler import get_scheduler
+from post_process import post_process_clips, add_post_process_arguments, options_from_args
+from run_journal import RunJournal
+from text_splitter import PROVIDER_CHAR_LIMITS
+from batch_packing import pack_batches, load_latency_model
+from auto_tune import tuned_chunk_size
+from incremental import (DEFAULT_SEGMENT_CHARS, load_segments, plan_segments, schedule_batches,
+                         reused_words, splice_output)
+from instrumentation import span, run_instrumented
+
+DEFAULT_CONCURRENCY = 4
 
 def load_test_words(filename):
     """Load test words from file"""
-    with open(filename, 'r', encoding='utf-8') as f:
+    with span("load_words", file=filename) as s, open(filename, 'r', encoding='utf-8') as f:
         words = [line.strip() for line in f if line.strip()]
+        s.set(words=len(words), chars=sum(len(word) for word in words))
     return words
 
-def create_batches(words, max_chars=400):
-    """Split words into batches under character limit"""
-    batches = []
-    current_batch = []
-    current_length = 0
-
-    for word in words:
-        # Calculate length if we add this word
-        word_length = len(word) + 2  # +2 for ", "
-
-        if current_length + word_length > max_chars and current_batch:
-            # Start new batch
-            batches.append(current_batch)
-            current_batch = [word]
-            current_length = len(word)
-        else:
-            current_batch.append(word)
-            current_length += word_length
+def create_batches(words, max_chars=PROVIDER_CHAR_LIMITS["rime"], concurrency=1, model=None,
+                   extra_batches=0):
+    """Split words into batches under character limit
+
+    Uses as few batches as possible, balanced in length so that with
+    `concurrency` requests in flight the slowest batch finishes early.
+    See batch_packing.pack_batches.
+    """
+    with span("batching", words=len(words), max_chars=max_chars) as s:
+        batches = pack_batches(words, max_chars, concurrency, model, extra_batches)
+        s.set(batches=len(batches))
+    return batches
 
-    if current_batch:
-        batches.append(current_batch)
+def batch_text(words_batch):
+    """Text sent for a batch of words"""
+    return ", ".join(words_batch) + "."
 
-    return batches
+def generate_rime_batch(words_batch, api_key, batch_num, journal=None, transport="http"):
+    """Generate audio for a batch of words, returning the MP3 bytes
 
-def generate_rime_batch(words_batch, api_key, batch_num):
-    """Generate audio for a batch of words"""
+    If a RunJournal is given, batches it already holds are reused and newly
+    synthesized batches are recorded in it. transport="websocket" sends the
+    batch over a persistent WebSocket instead of an HTTPS POST. Requests go
+    through the process-wide scheduler, so TTS_MAX_CONCURRENCY and
+    RIME_CHAR_BUDGET apply.
+    """
 
     # Create text from batch
-    text = ", ".join(words_batch) + "."
-    output_file = f"rime_batch_{batch_num:02d}.mp3"
-
-    # RIME.ai API endpoint
-    url = "https://users.rime.ai/v1/rime-tts"
-
-    headers = {
-        "Accept": "application/json",
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
-
-    payload = {
-        "speaker": "abbie",    # American female voice
-        "text": text,
-        "lang": "eng",         # English language
-        "audioFormat": "mp3",  # Audio format
-        "modelId": "mistv2"    # Use latest mistv2 model (Feb 2025)
-    }
-
-    print(f"Batch {batch_num}: {len(words_batch)} words, {len(text)} chars")
-    response = requests.post(url, headers=headers, json=payload, timeout=60)
+    text = batch_text(words_batch)
 
-    if response.status_code == 200:
-        response_data = response.json()
-        if 'audioContent' in response_data:
-            # Decode base64 audio content
-            audio_bytes = base64.b64decode(response_data['audioContent'])
+    client = get_client("rime", api_key, transport=transport)
+    payload = client.build_payload(text)
 
-            # Save to file
-            with open(output_file, 'wb') as f:
-                f.write(audio_bytes)
+    print(f"Batch {batch_num}: {len(words_batch)} words, {len(text)} chars")
 
-            print(f"✅ Saved {output_file}")
-            return output_file
-        else:
-            print(f"❌ No audioContent in response: {response_data}")
-            return None
-    else:
-        print(f"❌ RIME.ai API error: {response.status_code}")
-        print(f"Response: {response.text}")
+    # Skip batches already completed by an earlier, interrupted run
+    if journal:
+        audio_bytes = journal.completed(batch_num, text)
+        if audio_bytes is not None:
+            print(f"✅ Batch {batch_num} ready (resumed)")
+            return audio_bytes
+
+    # The scheduler answers identical requests from the cache without queueing them
+    start = time.perf_counter()
+    with span("synthesize_batch", provider="rime", chars=len(text), batch=batch_num) as s:
+        job = get_scheduler().submit("rime", text, client=client, payload=payload)
+        audio_bytes = job.result()
+        s.set(bytes=len(audio_bytes or b""))
+    if audio_bytes is None:
+        print(f"❌ RIME.ai request failed for batch {batch_num}")
+        return None
+    if job.cached:
+        print(f"✅ Batch {batch_num} ready (cached)")
+        return audio_bytes
+
+    if journal:
+        journal.record(batch_num, text, audio_bytes, time.perf_counter() - start)
+
+    print(f"✅ Batch {batch_num} ready ({len(audio_bytes)} bytes)")
+    return audio_bytes
+
+def generate_rime_batches(batches, api_key, concurrency=DEFAULT_CONCURRENCY, journal=None, transport="http"):
+    """Generate audio for all batches, keeping up to `concurrency` requests in flight
+
+    Returns the batch audio in original batch order, or None if any batch failed.
+    """
+    if concurrency <= 1:
+        batch_audio = []
+        for i, batch in enumerate(batches, 1):
+            print(f"\nProcessing batch {i}/{len(batches)}...")
+            audio_bytes = generate_rime_batch(batch, api_key, i, journal, transport)
+            if not audio_bytes:
+                print(f"❌ Batch {i} failed")
+                return None
+            batch_audio.append(audio_bytes)
+        return batch_audio
+
+    print(f"\nProcessing {len(batches)} batches with {concurrency} concurrent requests...")
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [
+            executor.submit(generate_rime_batch, batch, api_key, i, journal, transport)
+            for i, batch in enumerate(batches, 1)
+        ]
+        # Results are collected in submission order so batches reassemble correctly
+        batch_audio = [future.result() for future in futures]
+
+    failed = [i for i, audio_bytes in enumerate(batch_audio, 1) if not audio_bytes]
+    if failed:
+        print(f"❌ Batches failed: {', '.join(str(i) for i in failed)}")
         return None
 
-def concatenate_with_ffmpeg(batch_files, output_file):
-    """Use ffmpeg to concatenate MP3 files"""
+    return batch_audio
 
-    # Create a file list for ffmpeg
-    with open('file_list.txt', 'w') as f:
-        for batch_file in batch_files:
-            f.write(f"file '{batch_file}'\n")
+def concatenate_batches(layout, batches, batch_audio, output_file, segment_key, settings=None):
+    """Join reused segments and new batch audio into output_file without ffmpeg
 
-    # Use ffmpeg to concatenate
+    Also records which words each segment covers, for the next --incremental run.
+    """
     try:
-        cmd = ['ffmpeg', '-f', 'concat', '-safe', '0', '-i', 'file_list.txt', '-c', 'copy', output_file, '-y']
-        result = subprocess.run(cmd, capture_output=True, text=True)
-
-        if result.returncode == 0:
-            print(f"✅ Successfully concatenated to {output_file}")
+        splice_output(layout, batches, batch_audio, output_file, segment_key, settings)
+    except OSError as e:
+        print(f"❌ Concatenation error: {e}")
+        return False
 
-            # Clean up batch files and file list
-            for batch_file in batch_files:
-                os.remove(batch_file)
-            os.remove('file_list.txt')
+    print(f"✅ Successfully concatenated to {output_file}")
+    return True
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Generate RIME.ai audio for all test words")
+    parser.add_argument("--concurrency", type=int,
+                        default=int(os.getenv('RIME_CONCURRENCY', DEFAULT_CONCURRENCY)),
+                        help="Number of batch requests in flight at once (1 = sequential)")
+    parser.add_argument("--max-chars", type=int, default=None,
+                        help="Characters per batch (default: auto-tuned from past runs, at most 500)")
+    parser.add_argument("--extra-batches", type=int, default=0,
+                        help="Allow up to N more batches than the minimum if that shortens the run")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only synthesize words added or changed since the last run and splice them in")
+    parser.add_argument("--segment-chars", type=int, default=DEFAULT_SEGMENT_CHARS,
+                        help="With --incremental, largest batch to create, so later edits redo less")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="Ignore batches completed by a previous failed run")
+    parser.add_argument("--transport", choices=["http", "websocket"], default=os.getenv('RIME_TRANSPORT', "http"),
+                        help="Send batches as HTTPS POSTs or pipeline them over persistent WebSockets")
+    parser.add_argument("--post-process", action="store_true",
+                        help="Trim silence, normalize loudness and transcode each batch before combining")
+    add_post_process_arguments(parser)
+    parser.add_argument("--hedge-percentile", type=float, default=None,
+                        help="Send a duplicate of any HTTP request still unanswered at this latency percentile (e.g. 95)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
 
-            return True
-        else:
-            print(f"❌ ffmpeg error: {result.stderr}")
-            return False
-
-    except FileNotFoundError:
-        print("❌ ffmpeg not found. Installing via homebrew...")
-        try:
-            subprocess.run(['brew', 'install', 'ffmpeg'], check=True)
-            print("✅ ffmpeg installed. Retrying concatenation...")
-            return concatenate_with_ffmpeg(batch_files, output_file)
-        except subprocess.CalledProcessError:
-            print("❌ Failed to install ffmpeg")
-            return False
-
-def main():
     # Check for API key
-    api_key = os.getenv('RIME_API_KEY')
+    api_key = get_api_key("rime")
     if not api_key:
         print("Error: RIME_API_KEY not found in environment")
         return False
 
+    if args.transport == "websocket" and not websocket_available():
+        print("Error: --transport websocket needs the websockets package (pip install websockets)")
+        return False
+
+    if args.transport == "websocket" and args.hedge_percentile:
+        print("Error: --hedge-percentile only applies to --transport http")
+        return False
+
     # Change to script directory
     script_dir = os.path.dirname(os.path.abspath(__file__))
     os.chdir(script_dir)
@@ -139,35 +190,100 @@ def main():
     words = load_test_words("test_words.txt")
     print(f"Loaded {len(words)} test words")
 
-    # Create batches
-    batches = create_batches(words, max_chars=400)
-    print(f"Split into {len(batches)} batches")
+    # With --incremental, keep the previous output's segments that still match the word list
+    output_file = "rime_all_words_full.mp3"
+    client = get_client("rime", api_key)
+    settings = {"post_process": list(options_from_args(args)) if args.post_process else None}
+
+    def segment_key(batch):
+        return client.cache_key(client.build_payload(batch_text(batch)))
+
+    previous = load_segments(output_file, settings) if args.incremental else []
+    plan = plan_segments(words, previous, segment_key)
+    if args.incremental:
+        reused = reused_words(plan)
+        print(f"♻️ Incremental: reusing {reused} words from {output_file}, "
+              f"synthesizing {len(words) - reused}")
+
+    # Journal completed batches so a failed run can resume where it stopped. It is keyed on the
+    # words and explicit options rather than the batches: the tuned batch size and latency model
+    # are refit after every run (including the failed one), so a resume reuses the journaled batches
+    journal_key = [json.dumps({"max_chars": args.max_chars, "incremental": args.incremental,
+                               "segment_chars": args.segment_chars, "extra_batches": args.extra_batches}),
+                   *words]
+    journal = RunJournal("rime_full", journal_key)
+    if args.no_resume:
+        journal.finish()
+        journal = RunJournal("rime_full", journal_key)
+    saved = journal.load_settings()
+
+    # Create batches for the remaining words, sized for the best measured throughput
+    if saved:
+        max_chars = saved["max_chars"]
+    else:
+        max_chars = args.max_chars or tuned_chunk_size("rime")
+        if args.incremental:
+            max_chars = min(max_chars, args.segment_chars)
+    model = load_latency_model("rime")
+    runs = []
+
+    def make_batches(run):
+        saved_runs = saved["runs"] if saved else []
+        if len(runs) < len(saved_runs) and [word for batch in saved_runs[len(runs)] for word in batch] == list(run):
+            batches = saved_runs[len(runs)]
+        else:
+            batches = create_batches(run, max_chars=max_chars, concurrency=args.concurrency, model=model,
+                                     extra_batches=args.extra_batches)
+        runs.append(batches)
+        return batches
+
+    layout, batches = schedule_batches(plan, make_batches)
+    if batches:
+        lengths = [len(batch_text(batch)) for batch in batches]
+        print(f"Split into {len(batches)} batches ({min(lengths)}-{max(lengths)} chars)")
+    if saved and journal.records:
+        print(f"♻️ Resuming: {len(journal.records)}/{len(batches)} batches already completed "
+              f"(batched at {max_chars} chars)")
+    journal.save_settings({"max_chars": max_chars, "runs": runs})
+
+    # Optionally hedge slow requests with a duplicate
+    hedger = client.enable_hedging(args.hedge_percentile) if args.hedge_percentile else None
 
     # Generate audio for each batch
-    batch_files = []
-    for i, batch in enumerate(batches, 1):
-        print(f"\nProcessing batch {i}/{len(batches)}...")
-        batch_file = generate_rime_batch(batch, api_key, i)
-        if batch_file:
-            batch_files.append(batch_file)
-        else:
-            print(f"❌ Batch {i} failed")
+    batch_audio = generate_rime_batches(batches, api_key, concurrency=args.concurrency, journal=journal,
+                                        transport=args.transport)
+    get_scheduler().print_stats()
+    if batch_audio is None:
+        print(f"💾 Completed batches kept in {journal.run_dir}; re-run to resume")
+        return False
+
+    # Trim, normalize and transcode each batch across all cores
+    if args.post_process and batch_audio:
+        batch_audio = post_process_clips(batch_audio, options_from_args(args), args.workers)
+        if batch_audio is None:
             return False
 
-    # Concatenate all files
-    output_file = "rime_all_words_full.mp3"
-    print(f"\nCombining {len(batch_files)} audio files...")
+    # Concatenate all batches
+    print(f"\nCombining {len(layout)} audio segments ({len(batch_audio)} new)...")
+
+    if concatenate_batches(layout, batches, batch_audio, output_file, segment_key, settings):
+        journal.finish()
 
-    if concatenate_with_ffmpeg(batch_files, output_file):
         # Show file size
         if os.path.exists(output_file):
             size = os.path.getsize(output_file) / 1024 / 1024  # MB
             print(f"📁 File size: {size:.2f} MB")
             print(f"📝 Total words: {len(words)}")
 
+        cache = get_default_cache()
+        if cache:
+            cache.print_stats()
+        if hedger:
+            hedger.print_stats()
+
         return True
     else:
         return False
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(0 if run_instrumented(main, "rime_full") else 1)
\ No newline at end of file
@@ -10,24 +10,61 @@ import requests
 import time
 import json
 
+from tts_cache import get_default_cache
+from tts_client import get_client, get_api_key
+from mp3_concat import write_concatenated_mp3
+from text_splitter import split_text, synthesize_chunks
+from auto_tune import tuned_chunk_size
+from instrumentation import span, run_instrumented
+
 def load_test_words(filename):
     """Load test words from file"""
-    with open(filename, 'r', encoding='utf-8') as f:
+    with span("load_words", file=filename) as s, open(filename, 'r', encoding='utf-8') as f:
         words = [line.strip() for line in f if line.strip()]
+        s.set(words=len(words), chars=sum(len(word) for word in words))
     return words
 
 def create_combined_text(words):
-    """Create text with proper spacing for TTS - limit to 500 chars for RIME"""
-    # For RIME: shorter format to fit 500 char limit
-    # Just the words with commas, no numbers
-    text = ", ".join(words[:25])  # Take first 25 words to stay under 500 chars
+    """Create text with proper spacing for TTS - no numbers"""
+    # Just the words with commas; text over RIME's 500 char limit is split later
+    text = ", ".join(words)
     return text + "."
 
-def generate_rime_audio(text, output_file):
-    """Generate audio using RIME.ai API"""
+def synthesize_rime_chunk(client, text, cache=None):
+    """Synthesize one chunk of text within RIME's limit, returning MP3 bytes or None"""
+    payload = client.build_payload(text)
+
+    # Reuse previously synthesized audio for identical requests
+    cache_key = client.cache_key(payload)
+    if cache:
+        audio_bytes = cache.get(cache_key)
+        if audio_bytes is not None:
+            print(f"✅ Chunk ready ({len(text)} chars, cached)")
+            return audio_bytes
+
+    print(f"Sending request to RIME.ai ({len(text)} chars)...")
+    try:
+        # RIME returns JSON with base64-encoded audio, decoded as it arrives
+        audio_bytes = client.synthesize(payload, timeout=120)
+    except (requests.exceptions.HTTPError, ValueError) as e:
+        print(f"❌ {e}")
+        return None
+
+    if cache:
+        cache.put(cache_key, audio_bytes)
+    return audio_bytes
+
+def generate_rime_audio(text, output_file, concurrency=4):
+    """Generate audio using RIME.ai API
+
+    Text over RIME's 500 char limit (or the auto-tuned chunk size, if smaller)
+    is split at sentence, clause or whitespace boundaries, the chunks are
+    synthesized up to `concurrency` at a time, and the audio is stitched back
+    together in order.
+    """
 
     # Check for API key
-    api_key = os.getenv('RIME_API_KEY')
+    api_key = get_api_key("rime")
     if not api_key:
         print("Error: RIME_API_KEY not found in environment")
         return False
@@ -36,48 +73,24 @@ def generate_rime_audio(text, output_file):
         print("Generating RIME.ai audio...")
         print(f"Text length: {len(text)} characters")
 
-        # RIME.ai API endpoint
-        url = "https://users.rime.ai/v1/rime-tts"
+        # Use Abbie voice (available in default mist model)
+        client = get_client("rime", api_key)
+        cache = get_default_cache()
 
-        headers = {
-            "Accept": "application/json",
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json"
-        }
+        chunk_chars = tuned_chunk_size("rime")
+        with span("split_text", chars=len(text)):
+            chunks = split_text(text, chunk_chars)
+        if len(chunks) > 1:
+            print(f"✂️ Splitting into {len(chunks)} chunks of up to {chunk_chars} chars")
 
-        # Use Abbie voice (available in default mist model)
-        payload = {
-            "speaker": "abbie",    # American female voice
-            "text": text,
-            "lang": "eng",         # English language
-            "audioFormat": "mp3",  # Audio format
-            "modelId": "mistv2"    # Use latest mistv2 model (Feb 2025)
-        }
-
-        print("Sending request to RIME.ai...")
-        response = requests.post(url, headers=headers, json=payload, timeout=120)
-
-        if response.status_code == 200:
-            # RIME returns JSON with base64-encoded audio
-            import json
-            import base64
-
-            response_data = response.json()
-            if 'audioContent' in response_data:
-                # Decode base64 audio content
-                audio_bytes = base64.b64decode(response_data['audioContent'])
-                with open(output_file, 'wb') as f:
-                    f.write(audio_bytes)
-                print(f"✅ RIME.ai audio saved to: {output_file}")
-                return True
-            else:
-                print(f"❌ No audioContent in response: {response_data}")
-                return False
-        else:
-            print(f"❌ RIME.ai API error: {response.status_code}")
-            print(f"Response: {response.text}")
+        parts = synthesize_chunks(chunks, lambda chunk: synthesize_rime_chunk(client, chunk, cache), concurrency)
+        if not parts or any(part is None for part in parts):
             return False
 
+        write_concatenated_mp3(parts, output_file)
+        print(f"✅ RIME.ai audio saved to: {output_file}")
+        return True
+
     except requests.exceptions.Timeout:
         print("❌ Request timed out - try reducing text length")
         return False
@@ -109,9 +122,13 @@ def main():
         if os.path.exists(output_file):
             size = os.path.getsize(output_file) / 1024 / 1024  # MB
             print(f"📁 File size: {size:.2f} MB")
+
+        cache = get_default_cache()
+        if cache:
+            cache.print_stats()
     else:
         print("\n❌ Failed to generate audio")
-        sys.exit(1)
+    return success
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(0 if run_instrumented(main, "rime_tts") else 1)
\ No newline at end of file
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+WebSocket transport for RIME.ai
+Keeps a few long-lived sockets open and pipelines many texts over them, so
+thousands of short utterances don't each pay for a new HTTPS request. Every
+text is sent with its own contextId; the reader thread routes audio frames
+back to the request that asked for them.
+
+Messages (JSON, one per frame):
+  client -> server  {"text": ..., "contextId": id} then {"operation": "flush", "contextId": id}
+  server -> client  {"type": "chunk", "data": <base64 mp3>, "contextId": id}
+                    {"type": "done", "contextId": id}
+                    {"type": "error", "message": ..., "contextId": id}
+"""
+
+import io
+import os
+import json
+import time
+import uuid
+import base64
+import binascii
+import threading
+from urllib.parse import urlencode
+
+import requests
+
+from tts_client import RimeClient, RIME_DEFAULT_SPEAKER, RIME_DEFAULT_MODEL, DEFAULT_MAX_RETRIES, get_limiter
+from rate_limit import send_with_retry
+from auto_tune import get_recorder
+from instrumentation import span
+
+try:
+    from websockets.sync.client import connect
+    from websockets.exceptions import WebSocketException
+except ImportError:  # Optional dependency: pip install websockets
+    connect = None
+    WebSocketException = None
+
+RIME_WS_URL = "wss://users.rime.ai/ws2"
+DEFAULT_CONNECTIONS = 2
+OPEN_TIMEOUT = 10
+
+class RimeWebSocketError(requests.exceptions.RequestException):
+    """A WebSocket synthesis request failed (raised like any other request error)"""
+
+class RimeWebSocketConnectionError(RimeWebSocketError, requests.exceptions.ConnectionError):
+    """The socket couldn't be opened or dropped mid-request (retried with backoff)"""
+
+class RimeWebSocketTimeout(RimeWebSocketError, requests.exceptions.Timeout):
+    """No complete response in time (retried with backoff)"""
+
+def websocket_available():
+    """True if the optional websockets package is installed"""
+    return connect is not None
+
+class _Utterance:
+    """Audio collected for one contextId"""
+
+    # A finished utterance counts as a successful response to send_with_retry
+    status_code = 200
+
+    def __init__(self):
+        self.audio = io.BytesIO()
+        self.done = threading.Event()
+        self.error = None
+        self.connection_lost = False
+
+class _Session:
+    """One open WebSocket plus the reader thread demultiplexing its frames"""
+
+    def __init__(self, url, headers):
+        self.ws = connect(url, additional_headers=headers, open_timeout=OPEN_TIMEOUT, max_size=None)
+        self.pending = {}
+        self.closed = False
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._reader = threading.Thread(target=self._read, daemon=True)
+        self._reader.start()
+
+    @property
+    def load(self):
+        return len(self.pending)
+
+    def submit(self, text):
+        """Queue text for synthesis and return its _Utterance"""
+        context_id = uuid.uuid4().hex
+        utterance = _Utterance()
+        with self._lock:
+            if self.closed:
+                raise RimeWebSocketConnectionError("WebSocket connection is closed")
+            self.pending[context_id] = utterance
+
+        try:
+            # Text and flush go out back to back so contexts never interleave on the wire
+            with self._send_lock:
+                self.ws.send(json.dumps({"text": text, "contextId": context_id}))
+                self.ws.send(json.dumps({"operation": "flush", "contextId": context_id}))
+        except (WebSocketException, OSError) as e:
+            self.forget(context_id)
+            raise RimeWebSocketConnectionError(f"WebSocket send failed: {e}")
+        return context_id, utterance
+
+    def forget(self, context_id):
+        with self._lock:
+            self.pending.pop(context_id, None)
+
+    def _read(self):
+        reason = "WebSocket connection closed"
+        try:
+            for message in self.ws:
+                data = json.loads(message)
+                context_id = data.get("contextId")
+                with self._lock:
+                    utterance = self.pending.get(context_id)
+                if utterance is None:
+                    continue  # Late frames for a request that timed out
+
+                kind = data.get("type")
+                if kind == "chunk":
+                    utterance.audio.write(base64.b64decode(data.get("data", "")))
+                elif kind in ("done", "error"):
+                    if kind == "error":
+                        utterance.error = data.get("message", "unknown error")
+                    self.forget(context_id)
+                    utterance.done.set()
+        except (WebSocketException, OSError, ValueError, binascii.Error) as e:
+            reason = f"WebSocket connection lost: {e}"
+        finally:
+            with self._lock:
+                self.closed = True
+                pending, self.pending = self.pending, {}
+            for utterance in pending.values():
+                utterance.error = reason
+                utterance.connection_lost = True
+                utterance.done.set()
+
+    def close(self):
+        self.ws.close()
+
+class RimeWebSocketClient:
+    """RIME.ai over persistent WebSockets, spreading texts across `connections` sockets
+
+    Exposes the same build_payload / cache_key / synthesize interface as
+    RimeClient, so the scripts can switch transports without other changes.
+    Requests go through the same shared RIME limiter, retry/backoff and
+    latency recorder as HTTP ones.
+    """
+
+    provider = "rime"
+
+    # Payloads and cache keys match the HTTP client, so cached audio is shared
+    build_payload = RimeClient.build_payload
+    cache_key = RimeClient.cache_key
+
+    def __init__(self, api_key, url=None, pool_size=DEFAULT_CONNECTIONS, speaker=RIME_DEFAULT_SPEAKER,
+                 model_id=RIME_DEFAULT_MODEL):
+        if not websocket_available():
+            raise RimeWebSocketError("WebSocket transport needs the websockets package (pip install websockets)")
+        self.api_key = api_key
+        self.speaker = speaker
+        self.model_id = model_id
+        base_url = url or os.getenv('RIME_WS_URL', RIME_WS_URL)
+        query = urlencode({"speaker": speaker, "modelId": model_id, "audioFormat": "mp3", "lang": "eng"})
+        self.url = f"{base_url}?{query}"
+        self.connections = max(1, int(os.getenv('RIME_WS_CONNECTIONS', min(pool_size, DEFAULT_CONNECTIONS))))
+        self.limiter = get_limiter(self.provider, pool_size)
+        self.recorder = get_recorder()
+        self.max_retries = int(os.getenv('TTS_MAX_RETRIES', DEFAULT_MAX_RETRIES))
+        self.sessions = []
+        self._lock = threading.Lock()
+
+    def _session(self):
+        """Least busy open session, opening a new one while under the connection limit"""
+        with self._lock:
+            self.sessions = [session for session in self.sessions if not session.closed]
+            idle = [session for session in self.sessions if session.load == 0]
+            if idle:
+                return idle[0]
+            if len(self.sessions) < self.connections:
+                try:
+                    session = _Session(self.url, {"Authorization": f"Bearer {self.api_key}"})
+                except (WebSocketException, OSError) as e:
+                    raise RimeWebSocketConnectionError(f"Could not open WebSocket to {self.url}: {e}")
+                self.sessions.append(session)
+                return session
+            return min(self.sessions, key=lambda session: session.load)
+
+    def synthesize(self, payload, timeout=60):
+        """Synthesize payload["text"] and return MP3 bytes
+
+        Runs under the shared RIME limiter. Dropped connections and timeouts
+        are retried with backoff on a fresh socket; errors from the server
+        raise RimeWebSocketError.
+        """
+        chars = len(payload["text"])
+
+        def send():
+            start = time.perf_counter()
+            with span("ws_request", provider=self.provider, chars=chars) as s:
+                utterance = self._request(payload, timeout)
+                s.set(bytes=utterance.audio.tell())
+            if utterance.connection_lost:
+                raise RimeWebSocketConnectionError(f"RIME.ai WebSocket error: {utterance.error}")
+            if utterance.error:
+                raise RimeWebSocketError(f"RIME.ai WebSocket error: {utterance.error}")
+            if self.recorder:
+                self.recorder.record(self.provider, chars, time.perf_counter() - start)
+            return utterance
+
+        utterance = send_with_retry(send, self.limiter, chars=chars, max_retries=self.max_retries)
+        return utterance.audio.getvalue()
+
+    def _request(self, payload, timeout):
+        """Send one text on the least busy socket and wait for its _Utterance to finish"""
+        session = self._session()
+        context_id, utterance = session.submit(payload["text"])
+        if not utterance.done.wait(timeout):
+            session.forget(context_id)
+            raise RimeWebSocketTimeout(f"No response within {timeout}s")
+        return utterance
+
+    def close(self):
+        with self._lock:
+            for session in self.sessions:
+                session.close()
+            self.sessions = []
+
+WEBSOCKET_CLIENT_CLASSES = {
+    "rime": RimeWebSocketClient,
+}
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Resumable run journal for multi-request synthesis jobs
+Records every completed batch/sentence so a failed run only redoes what's missing
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+
+from instrumentation import span
+from http_replay import http_mode
+
+DEFAULT_JOURNAL_DIR = ".tts_runs"
+
+def text_hash(text):
+    """Hash of one item's input text"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+class RunJournal:
+    """Append-only manifest of completed items for one run
+
+    A run is identified by its name plus the full list of input texts, so
+    re-running the same command finds the same journal. Each completed item
+    is stored as an MP3 next to a manifest.jsonl line recording its input
+    hash, output location, byte size and latency. Settings the run was
+    planned with (batch sizes...) can be saved alongside, so a resumed run
+    repeats the same requests even if defaults have changed since.
+
+    In TTS_HTTP_MODE=record a run always starts afresh, so every request is
+    sent and captured in the fixtures rather than resumed.
+    """
+
+    def __init__(self, name, texts, root=DEFAULT_JOURNAL_DIR):
+        run_id = hashlib.sha256(json.dumps([name, list(texts)], ensure_ascii=False).encode('utf-8')).hexdigest()[:16]
+        self.run_dir = os.path.join(root, f"{name}-{run_id}")
+        self.manifest_path = os.path.join(self.run_dir, "manifest.jsonl")
+        self.settings_path = os.path.join(self.run_dir, "settings.json")
+        self.records = {}
+        self.resumed = 0
+        self._lock = threading.Lock()
+        if http_mode() == "record":
+            shutil.rmtree(self.run_dir, ignore_errors=True)
+        os.makedirs(self.run_dir, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.manifest_path):
+            return
+        with open(self.manifest_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Partially written line from an interrupted run
+                self.records[record["item"]] = record
+
+    def load_settings(self):
+        """Settings saved by the run being resumed, or None"""
+        try:
+            with open(self.settings_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def save_settings(self, settings):
+        """Save the settings this run was planned with"""
+        tmp_path = self.settings_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(settings, f, ensure_ascii=False)
+        os.replace(tmp_path, self.settings_path)
+
+    def completed(self, item, text):
+        """Return the stored audio for item if it already finished with this text, else None"""
+        record = self.records.get(str(item))
+        if not record or record["input_hash"] != text_hash(text):
+            return None
+
+        path = os.path.join(self.run_dir, record["output"])
+        if not os.path.exists(path) or os.path.getsize(path) != record["bytes"]:
+            return None
+
+        with open(path, 'rb') as f:
+            audio_bytes = f.read()
+        with self._lock:
+            self.resumed += 1
+        return audio_bytes
+
+    def record(self, item, text, audio_bytes, latency):
+        """Store a completed item's audio and append it to the manifest"""
+        output = f"item_{item}.mp3"
+        with span("journal_write", bytes=len(audio_bytes)), open(os.path.join(self.run_dir, output), 'wb') as f:
+            f.write(audio_bytes)
+
+        record = {
+            "item": str(item),
+            "input_hash": text_hash(text),
+            "output": output,
+            "bytes": len(audio_bytes),
+            "latency": round(latency, 4),
+            "completed_at": time.time(),
+        }
+        with self._lock:
+            with open(self.manifest_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record) + "\n")
+            self.records[record["item"]] = record
+
+    def finish(self):
+        """Remove the journal once the run's output has been written"""
+        shutil.rmtree(self.run_dir, ignore_errors=True)
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Cross-provider synthesis job scheduler
+Every synthesis job (provider, voice, model, text) goes into one queue served
+by a fixed pool of workers - a global concurrency cap shared by all
+providers. Jobs are picked shortest-first or fairly across providers, no
+provider gets more jobs in flight than its adaptive limit allows (so one
+throttled provider can't tie up every worker), and each provider can be
+given a character budget that is never overrun.
+
+rime_full.py, elevenlabs_tts.py and sentence_test_script.py send their
+requests through the process-wide get_scheduler(); corpus.py, sweep.py and
+audio_archive.py build their own from their options. Streamed ElevenLabs
+responses are written to disk as they arrive, so they bypass the queue (but
+not the provider's rate limiter).
+
+Configured from the environment by get_scheduler():
+    TTS_MAX_CONCURRENCY=16         jobs in flight across all providers (default 8)
+    TTS_SCHEDULE_POLICY=fair       "sjf" (shortest job first, default) or "fair"
+    RIME_CHAR_BUDGET=100000        characters this run may send to a provider
+"""
+
+import os
+import time
+import heapq
+import itertools
+import threading
+
+from tts_cache import get_default_cache
+from tts_client import CLIENT_CLASSES, get_client, get_api_key, get_limiter, voice_options
+from hedging import _percentile
+from instrumentation import span
+
+DEFAULT_CONCURRENCY = 8
+POLICIES = ("sjf", "fair")
+
+class SynthesisJob:
+    """One text to synthesize with one provider/voice/model; result() waits for the MP3 bytes"""
+
+    __slots__ = ("provider", "text", "voice", "model", "client", "payload", "key",
+                 "submitted", "started", "cached", "_audio", "_done")
+
+    def __init__(self, provider, text, voice, model, client, payload, key):
+        self.provider = provider
+        self.text = text
+        self.voice = voice
+        self.model = model
+        self.client = client
+        self.payload = payload
+        self.key = key
+        self.submitted = time.perf_counter()
+        self.started = None
+        self.cached = False
+        self._audio = None
+        self._done = threading.Event()
+
+    def finish(self, audio_bytes):
+        self._audio = audio_bytes
+        self._done.set()
+
+    def done(self):
+        return self._done.is_set()
+
+    def result(self, timeout=None):
+        """MP3 bytes, or None if synthesis failed or the provider's budget ran out"""
+        self._done.wait(timeout)
+        return self._audio
+
+class _ProviderQueue:
+    """Pending jobs and running totals for one provider"""
+
+    def __init__(self, budget=None, limiter=None):
+        self.heap = []
+        self.budget = budget
+        self.limiter = limiter
+        self.in_flight = 0
+        self.chars_sent = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.cached = 0
+        self.max_depth = 0
+        self.waits = []
+
+    @property
+    def max_in_flight(self):
+        # Follow the provider's shared AIMD limit, so a provider that is being throttled gets fewer workers
+        if self.limiter is None:
+            return None
+        return max(int(self.limiter.concurrency.limit), 1)
+
+class JobScheduler:
+    """One queue of synthesis jobs for every provider, served by `concurrency` workers
+
+    policy="sjf" runs the shortest queued text first (lowest mean wait);
+    policy="fair" serves the provider that has been sent the fewest
+    characters so far, shortest text first within it. char_budgets maps
+    provider -> characters; a job that would overrun its provider's budget
+    finishes with None instead of being sent. Cache hits are resolved at
+    submit time and never queued.
+    """
+
+    def __init__(self, concurrency=DEFAULT_CONCURRENCY, char_budgets=None, policy="sjf"):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown scheduling policy: {policy}")
+        self.concurrency = max(concurrency, 1)
+        self.char_budgets = dict(char_budgets or {})
+        self.policy = policy
+        self.queues = {}
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+        self._workers = []
+        self._closed = False
+
+    @property
+    def depth(self):
+        """Jobs waiting for a worker"""
+        with self._cond:
+            return sum(len(queue.heap) for queue in self.queues.values())
+
+    def submit(self, provider, text, voice=None, model=None, api_key=None, settings=None,
+               client=None, payload=None):
+        """Queue text for synthesis and return its SynthesisJob
+
+        settings are voice settings applied over the provider's defaults.
+        A caller with its own client (another transport, hedging...) or
+        payload (chunk context...) passes them instead.
+        """
+        if client is None:
+            api_key = api_key or get_api_key(provider)
+            client = get_client(provider, api_key, **voice_options(provider, voice, model, settings))
+        payload = payload or client.build_payload(text)
+        job = SynthesisJob(provider, text, voice, model, client, payload, client.cache_key(payload))
+
+        cache = get_default_cache()
+        audio_bytes = cache.get(job.key) if cache else None
+        with self._cond:
+            queue = self.queues.get(provider)
+            if queue is None:
+                limiter = get_limiter(provider) if client.limiter is not None else None
+                queue = self.queues[provider] = _ProviderQueue(self.char_budgets.get(provider), limiter)
+            if audio_bytes is not None:
+                queue.cached += 1
+                job.cached = True
+                job.finish(audio_bytes)
+                return job
+
+            heapq.heappush(queue.heap, (len(text), next(self._sequence), job))
+            queue.max_depth = max(queue.max_depth, len(queue.heap))
+            if len(self._workers) < self.concurrency:
+                worker = threading.Thread(target=self._work, daemon=True)
+                worker.start()
+                self._workers.append(worker)
+            self._cond.notify()
+        return job
+
+    def run(self, jobs):
+        """Submit (provider, text[, voice[, model]]) tuples and return their audio in order"""
+        submitted = [self.submit(*job) for job in jobs]
+        return [job.result() for job in submitted]
+
+    def _next_job(self):
+        """Pop the next (queue, job) to run, or (None, None) if no provider can take one now
+
+        Call with the lock held.
+        """
+        ready = [queue for queue in self.queues.values()
+                 if queue.heap and (queue.max_in_flight is None or queue.in_flight < queue.max_in_flight)]
+        if not ready:
+            return None, None
+        if self.policy == "fair":
+            queue = min(ready, key=lambda queue: (queue.chars_sent, queue.heap[0][:2]))
+        else:
+            queue = min(ready, key=lambda queue: queue.heap[0][:2])
+        return queue, heapq.heappop(queue.heap)[2]
+
+    def _work(self):
+        while True:
+            with self._cond:
+                queue, job = self._next_job()
+                while job is None:
+                    if self._closed:
+                        return
+                    # Woken by new jobs or finished ones; the timeout catches AIMD limits growing back
+                    self._cond.wait(0.1)
+                    queue, job = self._next_job()
+
+                job.started = time.perf_counter()
+                queue.waits.append(job.started - job.submitted)
+                if queue.budget is not None and queue.chars_sent + len(job.text) > queue.budget:
+                    if not queue.rejected:
+                        print(f"💸 {job.provider}: {queue.budget}-character budget reached, "
+                              f"skipping jobs that would overrun it")
+                    queue.rejected += 1
+                    job.finish(None)
+                    continue
+                queue.chars_sent += len(job.text)
+                queue.in_flight += 1
+
+            # Whatever happens, the job is resolved and the provider's slot freed
+            audio_bytes = None
+            try:
+                audio_bytes = self._synthesize(job)
+            finally:
+                with self._cond:
+                    queue.in_flight -= 1
+                    if audio_bytes is None:
+                        queue.failed += 1
+                    else:
+                        queue.completed += 1
+                    self._cond.notify_all()
+                job.finish(audio_bytes)
+
+    def _synthesize(self, job):
+        try:
+            with span("scheduled_job", provider=job.provider, chars=len(job.text),
+                      wait=round(job.started - job.submitted, 6)) as s:
+                audio_bytes = job.client.synthesize(job.payload)
+                s.set(bytes=len(audio_bytes))
+
+            cache = get_default_cache()
+            if cache:
+                cache.put(job.key, audio_bytes)
+        except Exception as e:
+            # A worker must survive any failure, or its job would never finish
+            print(f"❌ {job.provider}: {job.text[:40]}: {e}")
+            return None
+        return audio_bytes
+
+    def close(self):
+        """Let the workers exit once the queue is empty"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        for worker in self._workers:
+            worker.join()
+        self._workers = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def print_stats(self):
+        """Print per-provider job counts, characters against budget, queue depth and wait times"""
+        print(f"\n🗂️ Scheduler ({self.policy}, {self.concurrency} workers):")
+        with self._cond:
+            for provider, queue in sorted(self.queues.items()):
+                budget = f"/{queue.budget}" if queue.budget is not None else ""
+                line = (f"   {provider}: {queue.completed} done, {queue.cached} cached, {queue.failed} failed, "
+                        f"{queue.rejected} over budget; {queue.chars_sent}{budget} chars; "
+                        f"max queue {queue.max_depth}")
+                if queue.waits:
+                    line += (f"; wait p50 {_percentile(queue.waits, 50):.2f}s, "
+                             f"p95 {_percentile(queue.waits, 95):.2f}s, max {max(queue.waits):.2f}s")
+                print(line)
+
+def budgets_from_env(providers):
+    """Character budgets from <PROVIDER>_CHAR_BUDGET for the given providers"""
+    budgets = {}
+    for provider in providers:
+        budget = os.getenv(f'{provider.upper()}_CHAR_BUDGET')
+        if budget:
+            budgets[provider] = int(budget)
+    return budgets
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler():
+    """Return the process-wide scheduler configured from TTS_MAX_CONCURRENCY,
+    TTS_SCHEDULE_POLICY and <PROVIDER>_CHAR_BUDGET"""
+    global _scheduler
+
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = JobScheduler(int(os.getenv('TTS_MAX_CONCURRENCY', DEFAULT_CONCURRENCY)),
+                                      budgets_from_env(CLIENT_CLASSES),
+                                      os.getenv('TTS_SCHEDULE_POLICY', "sjf"))
+        return _scheduler
@@ -6,218 +6,283 @@ Tests TTS pronunciation in conversational context
 
 import os
 import sys
-import requests
+import time
+import argparse
 import json
-import base64
+from concurrent.futures import ThreadPoolExecutor
+
+from tts_cache import get_default_cache
+from tts_client import get_client, get_api_key
+from rime_ws import websocket_available
+from scheduler import get_scheduler
+from instrumentation import span, run_instrumented
+from post_process import post_process_clips, add_post_process_arguments, options_from_args
+from mp3_concat import concatenate_mp3, write_concatenated_mp3
+from run_journal import RunJournal
+from text_splitter import split_for_provider, synthesize_chunks
+from elevenlabs_tts import generate_elevenlabs_audio, generate_elevenlabs_chunked, post_process_output
+from corpus import iter_corpus
+
+SENTENCES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test_sentences.jsonl")
+
+CATEGORY_ICONS = {
+    "Food & Beverage": "🍔",
+    "Technology": "💻",
+    "Fashion & Luxury": "👗",
+    "Automotive": "🚗",
+    "Pharmaceuticals": "💊",
+    "Retail & Lifestyle": "🏪",
+    "Modern Tech": "📱",
+}
+
+def load_test_sentences(path=SENTENCES_FILE):
+    """Return the test sentences as CorpusItems, with their category and locale"""
+    return list(iter_corpus(path))
 
 def get_test_sentences():
-    """Return natural sentences organized by category"""
-    sentences = [
-        # Food & Beverage
-        "I love starting my morning with Häagen-Dazs ice cream, some fresh açaí bowls, and a quick stop at Chipotle for lunch.",
+    """Return the natural test sentences, in category order"""
+    return [item.text for item in load_test_sentences()]
+
+def synthesize_rime_text(client, text, label=""):
+    """Synthesize one chunk of text within RIME's limit, returning MP3 bytes or None
+
+    The request shares the process-wide scheduler with the ElevenLabs
+    pipeline, which answers identical requests from the cache.
+    """
+    audio_bytes = get_scheduler().submit("rime", text, client=client).result()
+    if audio_bytes is None:
+        print(f"❌ RIME request failed for {label}")
+    return audio_bytes
+
+def generate_rime_sentences(sentences, api_key, journal=None, chunk_concurrency=1, transport="http"):
+    """Generate audio for sentences using RIME.ai API, returning MP3 bytes per sentence
+
+    Sentences over RIME's 500 char limit are split at sentence, clause or
+    whitespace boundaries, synthesized chunk by chunk (up to chunk_concurrency
+    at once) and stitched back together in order. If a RunJournal is given,
+    sentences it already holds are reused and newly synthesized sentences are
+    recorded in it. transport="websocket" sends them over a persistent
+    WebSocket instead of HTTPS POSTs.
+    """
 
-        "My grocery list includes Nutella for breakfast, La Croix sparkling water, and some Ghirardelli chocolate for dessert.",
-
-        "The restaurant served bruschetta with sriracha sauce, and I ordered Worcestershire dressing on my quinoa salad.",
-
-        # Technology
-        "My new Huawei phone works great with my ASUS laptop, though I'm thinking of switching to Xiaomi next year.",
-
-        "I prefer using PostgreSQL databases over MySQL when building applications, especially with Kubernetes deployment.",
-
-        "The Bose headphones sound amazing, but Adobe software keeps crashing on my computer.",
-
-        # Fashion & Luxury
-        "She wore a beautiful Hermès scarf with her Givenchy dress to the Versace fashion show.",
-
-        "The boutique featured Yves Saint Laurent handbags, Balenciaga sneakers, and elegant Moschino accessories.",
-
-        "I found a vintage Loewe bag and some Bvlgari jewelry at the luxury consignment store.",
-
-        # Automotive
-        "His dream garage includes a Porsche sports car, a classic Peugeot sedan, and a reliable Hyundai SUV.",
-
-        "The Volkswagen dealership is next to the Citroën showroom, but I'm really interested in that Koenigsegg supercar.",
-
-        # Pharmaceuticals & Healthcare
-        "The doctor prescribed Tylenol for pain relief and mentioned that Pfizer makes excellent vaccines.",
-
-        "My prescription includes Xeljanz for arthritis, Humira injections, and Ozempic for diabetes management.",
-
-        # Retail & Lifestyle
-        "We shopped at IKEA for furniture, then stopped by the Swedish brand Fjällräven for hiking gear.",
-
-        "The Czech car manufacturer Škoda has great reviews, and I enjoyed a Hoegaarden beer while researching cars.",
-
-        "I'm saving up for a Tag Heuer watch and maybe an Audemars Piguet timepiece for special occasions.",
+    # RIME has 500 char limit, so we'll process sentences individually
+    sentence_audio = []
+    failed = []
 
-        # Modern Tech & Social
-        "My Oculus headset works perfectly for virtual meetings, and I post about it constantly on TikTok.",
+    client = get_client("rime", api_key, transport=transport)
 
-        "I use Lyft to get around the city, especially when I'm running late for important meetings."
-    ]
+    for i, sentence in enumerate(sentences, 1):
+        # Skip sentences already completed by an earlier, interrupted run
+        if journal:
+            audio_bytes = journal.completed(i, sentence)
+            if audio_bytes is not None:
+                sentence_audio.append(audio_bytes)
+                print(f"✅ Sentence {i} ready (resumed)")
+                continue
+
+        with span("split_text", chars=len(sentence)):
+            chunks = split_for_provider(sentence, "rime")
+        if len(chunks) > 1:
+            print(f"✂️ Sentence {i} is {len(sentence)} chars, splitting into {len(chunks)} chunks")
 
-    return sentences
+        print(f"Generating sentence {i}/{len(sentences)} ({len(sentence)} chars)")
+        start = time.perf_counter()
+        with span("synthesize_sentence", provider="rime", chars=len(sentence), sentence=i) as s:
+            parts = synthesize_chunks(
+                chunks,
+                lambda chunk: synthesize_rime_text(client, chunk, f"sentence {i}"),
+                chunk_concurrency,
+            )
+            s.set(bytes=sum(len(part) for part in parts if part))
+        if not parts or any(part is None for part in parts):
+            failed.append(i)
+            continue
 
-def generate_elevenlabs_audio(text, output_file, api_key):
-    """Generate audio using ElevenLabs API"""
+        audio_bytes = parts[0] if len(parts) == 1 else concatenate_mp3(parts)
+        if journal:
+            journal.record(i, sentence, audio_bytes, time.perf_counter() - start)
 
-    voice_id = "21m00Tcm4TlvDq8ikWAM"  # Rachel
-    url = f"https://api.elevenlabs.io/v1/text-to-speech/{voice_id}"
+        sentence_audio.append(audio_bytes)
+        print(f"✅ Sentence {i} ready ({len(audio_bytes)} bytes)")
 
-    headers = {
-        "Accept": "audio/mpeg",
-        "Content-Type": "application/json",
-        "xi-api-key": api_key
-    }
+    if failed:
+        print(f"⚠️ {len(failed)} sentence(s) missing after retries: {', '.join(str(i) for i in failed)}")
 
-    data = {
-        "text": text,
-        "model_id": "eleven_multilingual_v2",
-        "language_code": "en",
-        "voice_settings": {
-            "stability": 0.75,
-            "similarity_boost": 0.75,
-            "style": 0.0,
-            "use_speaker_boost": True
-        }
-    }
+    return sentence_audio
 
-    print("Generating ElevenLabs audio...")
-    response = requests.post(url, json=data, headers=headers, timeout=120)
+def concatenate_rime_audio(sentence_audio, output_file):
+    """Join RIME sentence audio into output_file without ffmpeg or temp files"""
 
-    if response.status_code == 200:
-        with open(output_file, 'wb') as f:
-            f.write(response.content)
-        return True
-    else:
-        print(f"❌ ElevenLabs error: {response.status_code} - {response.text}")
+    if not sentence_audio:
+        print("❌ No sentence audio to concatenate")
         return False
 
-def generate_rime_sentences(sentences, api_key):
-    """Generate audio for sentences using RIME.ai API with batching"""
-
-    # RIME has 500 char limit, so we'll process sentences individually
-    sentence_files = []
-
-    url = "https://users.rime.ai/v1/rime-tts"
-    headers = {
-        "Accept": "application/json",
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
-
-    for i, sentence in enumerate(sentences, 1):
-        if len(sentence) > 500:
-            print(f"⚠️ Sentence {i} too long ({len(sentence)} chars), skipping")
-            continue
-
-        payload = {
-            "speaker": "abbie",
-            "text": sentence,
-            "lang": "eng",
-            "audioFormat": "mp3",
-            "modelId": "mistv2"    # Use latest mistv2 model (Feb 2025)
-        }
-
-        print(f"Generating sentence {i}/{len(sentences)} ({len(sentence)} chars)")
-        response = requests.post(url, headers=headers, json=payload, timeout=60)
-
-        if response.status_code == 200:
-            response_data = response.json()
-            if 'audioContent' in response_data:
-                audio_bytes = base64.b64decode(response_data['audioContent'])
-
-                sentence_file = f"rime_sentence_{i:02d}.mp3"
-                with open(sentence_file, 'wb') as f:
-                    f.write(audio_bytes)
-
-                sentence_files.append(sentence_file)
-                print(f"✅ Saved {sentence_file}")
-            else:
-                print(f"❌ No audioContent in sentence {i}")
-        else:
-            print(f"❌ RIME error for sentence {i}: {response.status_code}")
+    try:
+        write_concatenated_mp3(sentence_audio, output_file)
+    except OSError as e:
+        print(f"❌ Concatenation error: {e}")
+        return False
 
-    return sentence_files
+    print(f"✅ RIME sentences concatenated to {output_file}")
+    return True
 
-def concatenate_rime_files(sentence_files, output_file):
-    """Concatenate RIME sentence files using ffmpeg"""
+def run_elevenlabs_pipeline(combined_text, api_key, stream=False, post_process=None, chunk_chars=None,
+                            chunk_concurrency=4, workers=None):
+    """Generate the ElevenLabs sentence file, returning True on success
 
-    if not sentence_files:
-        print("❌ No sentence files to concatenate")
+    post_process, if given, is the PostProcessOptions applied to the file,
+    through the same process pool as the RIME clips.
+    With chunk_chars, the text is sent as concurrent sentence-aligned chunks
+    written to the file in order as they finish.
+    """
+    print(f"\n🎵 Generating ElevenLabs audio...")
+    elevenlabs_file = "elevenlabs_sentences.mp3"
+    if chunk_chars:
+        if not generate_elevenlabs_chunked(combined_text, elevenlabs_file, chunk_chars, chunk_concurrency, api_key):
+            return False
+    elif not generate_elevenlabs_audio(combined_text, elevenlabs_file, stream=stream, api_key=api_key):
+        return False
+    if post_process and not post_process_output(elevenlabs_file, post_process, workers):
         return False
 
-    # Create file list for ffmpeg
-    with open('sentence_list.txt', 'w') as f:
-        for sentence_file in sentence_files:
-            f.write(f"file '{sentence_file}'\n")
-
-    try:
-        import subprocess
-        cmd = ['ffmpeg', '-f', 'concat', '-safe', '0', '-i', 'sentence_list.txt', '-c', 'copy', output_file, '-y']
-        result = subprocess.run(cmd, capture_output=True, text=True)
+    size = os.path.getsize(elevenlabs_file) / 1024 / 1024
+    print(f"✅ ElevenLabs: {elevenlabs_file} ({size:.2f} MB)")
+    return True
 
-        if result.returncode == 0:
-            print(f"✅ RIME sentences concatenated to {output_file}")
+def run_rime_pipeline(sentences, api_key, no_resume=False, chunk_concurrency=1, transport="http",
+                      post_process=None, workers=None):
+    """Generate the RIME sentence file, returning True on success
 
-            # Clean up
-            for sentence_file in sentence_files:
-                os.remove(sentence_file)
-            os.remove('sentence_list.txt')
+    post_process, if given, is the PostProcessOptions applied to each
+    sentence (over `workers` processes) before they are joined. If any
+    sentence is still missing the previous file is left untouched, and the
+    journal lets a re-run request just the missing ones.
+    """
+    # Generate RIME audio (sentence by sentence due to 500 char limit)
+    print(f"\n🎵 Generating RIME.ai audio...")
+    journal = RunJournal("rime_sentences", sentences)
+    if no_resume:
+        journal.finish()
+        journal = RunJournal("rime_sentences", sentences)
+    elif journal.records:
+        print(f"♻️ Resuming: {len(journal.records)}/{len(sentences)} sentences already completed")
+    sentence_audio = generate_rime_sentences(sentences, api_key, journal, chunk_concurrency, transport)
+
+    # Keep the previous output rather than replace it with one missing sentences
+    if len(sentence_audio) != len(sentences):
+        print(f"💾 Completed sentences kept in {journal.run_dir}; re-run to fill the gaps")
+        return False
 
-            return True
-        else:
-            print(f"❌ ffmpeg error: {result.stderr}")
+    # The journal keeps the raw audio; processing is redone from it on every run
+    if post_process:
+        processed = post_process_clips(sentence_audio, post_process, workers)
+        if processed is None:
             return False
+        sentence_audio = processed
 
-    except Exception as e:
-        print(f"❌ Concatenation error: {e}")
+    rime_file = "rime_sentences.mp3"
+    if not concatenate_rime_audio(sentence_audio, rime_file):
         return False
 
-def main():
+    size = os.path.getsize(rime_file) / 1024 / 1024
+    print(f"✅ RIME.ai: {rime_file} ({size:.2f} MB)")
+    journal.finish()
+    return True
+
+def run_pipelines(pipelines, concurrent=True):
+    """Run each provider pipeline, in parallel threads unless concurrent=False
+
+    Prints per-provider and total wall time and returns {name: success}.
+    """
+    def timed(name, pipeline):
+        start = time.perf_counter()
+        try:
+            success = pipeline()
+        except Exception as e:
+            print(f"❌ {name} pipeline error: {e}")
+            success = False
+        return success, time.perf_counter() - start
+
+    start = time.perf_counter()
+    if concurrent:
+        with ThreadPoolExecutor(max_workers=len(pipelines)) as executor:
+            futures = {name: executor.submit(timed, name, pipeline) for name, pipeline in pipelines.items()}
+            results = {name: future.result() for name, future in futures.items()}
+    else:
+        results = {name: timed(name, pipeline) for name, pipeline in pipelines.items()}
+    total = time.perf_counter() - start
+
+    print("\n⏱️ Wall time:")
+    for name, (success, elapsed) in results.items():
+        status = "✅" if success else "❌"
+        print(f"   {status} {name}: {elapsed:.2f}s")
+    print(f"   Total ({'concurrent' if concurrent else 'sequential'}): {total:.2f}s")
+
+    return {name: success for name, (success, _) in results.items()}
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Generate conversational sentence audio for both providers")
+    parser.add_argument("--stream", action="store_true",
+                        help="Use the ElevenLabs streaming endpoint and write audio as it arrives")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="Ignore RIME sentences completed by a previous failed run")
+    parser.add_argument("--sequential", action="store_true",
+                        help="Run ElevenLabs then RIME instead of both at once")
+    parser.add_argument("--chunk-concurrency", type=int, default=1,
+                        help="Chunks of an over-limit RIME sentence to synthesize at once")
+    parser.add_argument("--elevenlabs-chunk-chars", type=int, default=None,
+                        help="Send ElevenLabs text as concurrent sentence-aligned chunks of at most this many "
+                             "characters, written in order as they finish")
+    parser.add_argument("--elevenlabs-concurrency", type=int, default=4,
+                        help="ElevenLabs chunks in flight at once with --elevenlabs-chunk-chars")
+    parser.add_argument("--transport", choices=["http", "websocket"], default=os.getenv('RIME_TRANSPORT', "http"),
+                        help="Send RIME sentences as HTTPS POSTs or pipeline them over a persistent WebSocket")
+    parser.add_argument("--post-process", action="store_true",
+                        help="Trim silence, normalize loudness and transcode both providers' audio")
+    add_post_process_arguments(parser)
+    parser.add_argument("--hedge-percentile", type=float, default=None,
+                        help="Send a duplicate of any RIME HTTP request still unanswered at this latency percentile (e.g. 95)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+
     # Check API keys
-    elevenlabs_key = os.getenv('ELEVENLABS_API_KEY')
-    rime_key = os.getenv('RIME_API_KEY')
+    elevenlabs_key = get_api_key("elevenlabs")
+    rime_key = get_api_key("rime")
 
     if not elevenlabs_key:
         print("❌ ELEVENLABS_API_KEY not found")
-        return
+        return False
     if not rime_key:
         print("❌ RIME_API_KEY not found")
-        return
+        return False
+    if args.transport == "websocket" and not websocket_available():
+        print("❌ --transport websocket needs the websockets package (pip install websockets)")
+        return False
+
+    if args.transport == "websocket" and args.hedge_percentile:
+        print("❌ --hedge-percentile only applies to --transport http")
+        return False
 
     # Change to script directory
     script_dir = os.path.dirname(os.path.abspath(__file__))
     os.chdir(script_dir)
 
     # Get test sentences
-    sentences = get_test_sentences()
+    items = load_test_sentences()
+    sentences = [item.text for item in items]
     print(f"Generated {len(sentences)} test sentences")
 
     # Show the sentences
     print("\n📝 TEST SENTENCES:")
     print("=" * 60)
-    for i, sentence in enumerate(sentences, 1):
-        category = ""
-        if i <= 3:
-            category = "🍔 Food & Beverage"
-        elif i <= 6:
-            category = "💻 Technology"
-        elif i <= 9:
-            category = "👗 Fashion & Luxury"
-        elif i <= 11:
-            category = "🚗 Automotive"
-        elif i <= 13:
-            category = "💊 Pharmaceuticals"
-        elif i <= 16:
-            category = "🏪 Retail & Lifestyle"
-        else:
-            category = "📱 Modern Tech"
-
+    for i, item in enumerate(items, 1):
+        category = f"{CATEGORY_ICONS.get(item.category, '📝')} {item.category}"
         print(f"\n{category} - Sentence {i}:")
-        print(f"{sentence}")
-        print(f"({len(sentence)} characters)")
+        print(f"{item.text}")
+        print(f"({len(item.text)} characters)")
 
     print("\n" + "=" * 60)
 
@@ -225,25 +290,33 @@ def main():
     combined_text = " ".join(sentences)
     print(f"\nCombined text length: {len(combined_text)} characters")
 
-    # Generate ElevenLabs audio
-    print(f"\n🎵 Generating ElevenLabs audio...")
-    elevenlabs_file = "elevenlabs_sentences.mp3"
-    if generate_elevenlabs_audio(combined_text, elevenlabs_file, elevenlabs_key):
-        size = os.path.getsize(elevenlabs_file) / 1024 / 1024
-        print(f"✅ ElevenLabs: {elevenlabs_file} ({size:.2f} MB)")
-
-    # Generate RIME audio (sentence by sentence due to 500 char limit)
-    print(f"\n🎵 Generating RIME.ai audio...")
-    sentence_files = generate_rime_sentences(sentences, rime_key)
+    # Optionally hedge slow RIME requests with a duplicate
+    hedger = get_client("rime", rime_key).enable_hedging(args.hedge_percentile) if args.hedge_percentile else None
+
+    post_process = options_from_args(args) if args.post_process else None
+    pipelines = {
+        "ElevenLabs": lambda: run_elevenlabs_pipeline(combined_text, elevenlabs_key, args.stream, post_process,
+                                                      args.elevenlabs_chunk_chars, args.elevenlabs_concurrency,
+                                                      args.workers),
+        "RIME.ai": lambda: run_rime_pipeline(sentences, rime_key, args.no_resume,
+                                              args.chunk_concurrency, args.transport,
+                                              post_process, args.workers),
+    }
+    results = run_pipelines(pipelines, concurrent=not args.sequential)
 
-    if sentence_files:
-        rime_file = "rime_sentences.mp3"
-        if concatenate_rime_files(sentence_files, rime_file):
-            size = os.path.getsize(rime_file) / 1024 / 1024
-            print(f"✅ RIME.ai: {rime_file} ({size:.2f} MB)")
+    cache = get_default_cache()
+    if cache:
+        cache.print_stats()
+    get_scheduler().print_stats()
+    if hedger:
+        hedger.print_stats()
 
+    if not all(results.values()):
+        print("\n❌ Some audio files could not be generated")
+        return False
     print(f"\n🎧 Both audio files ready for comparison!")
     print("Open both files in QuickTime Player to compare pronunciation quality.")
+    return True
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(0 if run_instrumented(main, "sentence_test_script") else 1)
\ No newline at end of file
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Voice/model/settings sweep over a corpus
+Synthesizes every text of a corpus with every combination of the given
+voices, models and voice settings, per provider, in one process. Each text
+is read once and shared by all configurations, jobs for clips that are
+already archived (or identical across configurations) are never sent, and
+every clip lands in one packed audio archive labelled with its
+configuration, e.g. "rime/cove/mistv2" or "elevenlabs/<voice>/<model>/stability=0.3".
+
+Provider backends are only imported once options are parsed, so --help
+starts instantly.
+
+Usage:
+    python sweep.py test_words.txt --voice rime=abbie rime=cove --model rime=mistv2 rime=mist
+    python sweep.py brands.csv --providers elevenlabs --settings elevenlabs=stability=0.3 elevenlabs=stability=0.9
+    python audio_archive.py --archive sweep.tsa extract rime/cove/mistv2 "Quinoa"
+"""
+
+import os
+import sys
+import json
+import argparse
+import itertools
+from collections import deque, namedtuple, Counter
+
+from instrumentation import run_instrumented
+
+DEFAULT_CORPUS = "test_words.txt"
+DEFAULT_SWEEP_ARCHIVE = "sweep.tsa"
+DEFAULT_MAX_IN_FLIGHT = 32
+PROVIDERS = ("rime", "elevenlabs")
+
+SweepConfig = namedtuple("SweepConfig", ["provider", "voice", "model", "settings"])
+
+def config_label(config):
+    """Archive label for a configuration: provider/voice/model[/key=value,...]"""
+    label = f"{config.provider}/{config.voice}/{config.model}"
+    if config.settings:
+        label += "/" + ",".join(f"{key}={json.dumps(value)}" for key, value in sorted(config.settings.items()))
+    return label
+
+def parse_settings(value):
+    """"stability=0.3,use_speaker_boost=false" -> {"stability": 0.3, "use_speaker_boost": False}"""
+    settings = {}
+    for pair in value.split(","):
+        key, sep, raw = pair.partition("=")
+        if not sep or not key:
+            raise ValueError(f"Expected key=value, got '{pair}'")
+        try:
+            settings[key.strip()] = json.loads(raw)
+        except json.JSONDecodeError:
+            settings[key.strip()] = raw
+    return settings
+
+def by_provider(values, parse=str):
+    """Group PROVIDER=VALUE arguments into {provider: [parsed values]}"""
+    grouped = {}
+    for value in values or []:
+        provider, sep, rest = value.partition("=")
+        if not sep or provider not in PROVIDERS:
+            raise ValueError(f"Expected PROVIDER=VALUE with provider one of {', '.join(PROVIDERS)}, got '{value}'")
+        grouped.setdefault(provider, []).append(parse(rest))
+    return grouped
+
+def build_configs(providers, voices=None, models=None, settings=None):
+    """Every voice x model x settings combination for each provider
+
+    voices/models/settings map provider -> list; a provider without a list
+    uses its client's default.
+    """
+    from tts_client import CLIENT_CLASSES
+
+    voices, models, settings = voices or {}, models or {}, settings or {}
+    configs = []
+    for provider in providers:
+        client_class = CLIENT_CLASSES[provider]
+        if provider in settings and client_class.settings_option is None:
+            raise ValueError(f"{provider} has no voice settings")
+        for voice, model, options in itertools.product(voices.get(provider, [client_class.default_voice]),
+                                                       models.get(provider, [client_class.default_model]),
+                                                       settings.get(provider, [None])):
+            config = SweepConfig(provider, voice, model, options)
+            if config not in configs:
+                configs.append(config)
+    return configs
+
+def run_sweep(texts, configs, archive, scheduler, max_in_flight=DEFAULT_MAX_IN_FLIGHT):
+    """Synthesize each distinct text with every configuration into archive
+
+    Texts are streamed; at most max_in_flight jobs are queued or waiting to
+    be archived at once. A clip that is already archived, or shared with
+    another configuration, is indexed under every configuration's label
+    that produces it. Returns {label: Counter(added, archived, shared, failed)}.
+    """
+    from tts_client import get_client, get_api_key, voice_options
+
+    clients = [get_client(config.provider, get_api_key(config.provider),
+                          **voice_options(config.provider, config.voice, config.model, config.settings))
+               for config in configs]
+    labels = [config_label(config) for config in configs]
+    stats = {label: Counter() for label in labels}
+    seen_texts = set()
+    waiting = {}  # key of each pending job -> labels it is for, the submitting one first
+    pending = deque()
+
+    def archive_oldest():
+        job = pending.popleft()
+        label, *sharing = waiting.pop(job.key)
+        audio_bytes = job.result()
+        if audio_bytes is None:
+            for failed_label in (label, *sharing):
+                stats[failed_label]["failed"] += 1
+            return
+        archive.add(job.key, audio_bytes, label, job.text)
+        stats[label]["added"] += 1
+        for shared_label in sharing:
+            archive.label(job.key, shared_label, job.text)
+            stats[shared_label]["shared"] += 1
+
+    for text in texts:
+        if text in seen_texts:
+            continue
+        seen_texts.add(text)
+        for config, client, label in zip(configs, clients, labels):
+            key = client.cache_key(client.build_payload(text))
+            if key in waiting:
+                # Another configuration resolves to the same request (e.g. a default setting listed explicitly)
+                waiting[key].append(label)
+                continue
+            if key in archive:
+                archive.label(key, label, text)
+                stats[label]["archived"] += 1
+                continue
+            waiting[key] = [label]
+            if len(pending) >= max_in_flight:
+                archive_oldest()
+            pending.append(scheduler.submit(config.provider, text, config.voice, config.model,
+                                            settings=config.settings))
+    while pending:
+        archive_oldest()
+    return stats
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Sweep voices, models and voice settings over a corpus")
+    parser.add_argument("corpus", nargs="?", default=DEFAULT_CORPUS, help="Text, JSONL or CSV corpus file")
+    parser.add_argument("--providers", nargs="+", default=list(PROVIDERS), choices=PROVIDERS)
+    parser.add_argument("--voice", nargs="+", action="extend", metavar="PROVIDER=VOICE",
+                        help="Voices to sweep (default: each provider's default voice)")
+    parser.add_argument("--model", nargs="+", action="extend", metavar="PROVIDER=MODEL",
+                        help="Models to sweep (default: each provider's default model)")
+    parser.add_argument("--settings", nargs="+", action="extend", metavar="PROVIDER=KEY=VALUE[,KEY=VALUE]",
+                        help="Voice settings to sweep, applied over the defaults (ElevenLabs only)")
+    parser.add_argument("--category", default=None, help="Category for items without one")
+    parser.add_argument("--locale", default="en-US", help="Locale for items without one")
+    parser.add_argument("--archive", default=DEFAULT_SWEEP_ARCHIVE, help="Archive to add the clips to")
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help="Requests in flight across all providers (default: TTS_MAX_CONCURRENCY or 8)")
+    parser.add_argument("--policy", choices=["sjf", "fair"], default=None,
+                        help="Run the shortest texts first (sjf) or share work evenly across providers (fair)")
+    parser.add_argument("--max-in-flight", type=int, default=DEFAULT_MAX_IN_FLIGHT,
+                        help="Jobs queued or awaiting archiving at once")
+    parser.add_argument("--plan", action="store_true", help="List the configurations without synthesizing")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not os.path.exists(args.corpus):
+        print(f"❌ {args.corpus} not found")
+        return False
+
+    try:
+        voices = by_provider(args.voice)
+        models = by_provider(args.model)
+        settings = by_provider(args.settings, parse_settings)
+        configs = build_configs(args.providers, voices, models, settings)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return False
+
+    print(f"🎛️ {len(configs)} configurations:")
+    for config in configs:
+        print(f"   {config_label(config)}")
+    if args.plan:
+        return True
+
+    from corpus import iter_corpus
+    from audio_archive import AudioArchive
+    from scheduler import DEFAULT_CONCURRENCY, JobScheduler, budgets_from_env
+    from tts_client import get_api_key
+
+    for provider in {config.provider for config in configs}:
+        if not get_api_key(provider):
+            print(f"Error: {provider.upper()}_API_KEY not found in environment")
+            return False
+
+    scheduler = JobScheduler(args.concurrency or int(os.getenv('TTS_MAX_CONCURRENCY', DEFAULT_CONCURRENCY)),
+                             budgets_from_env(args.providers),
+                             args.policy or os.getenv('TTS_SCHEDULE_POLICY', "sjf"))
+    texts = (item.text for item in iter_corpus(args.corpus, args.category, args.locale))
+    print(f"🎵 Sweeping {args.corpus}...")
+    with AudioArchive(args.archive, writable=True) as archive, scheduler:
+        stats = run_sweep(texts, configs, archive, scheduler, args.max_in_flight)
+        clips = len(archive)
+    scheduler.print_stats()
+
+    print("\n📊 Sweep results:")
+    width = max(len(label) for label in stats)
+    for label, counts in stats.items():
+        print(f"   {label:<{width}} {counts['added']:>6} added {counts['archived']:>6} archived "
+              f"{counts['shared']:>4} shared {counts['failed']:>4} failed")
+    size = os.path.getsize(args.archive) / 1024 / 1024
+    print(f"📁 {args.archive}: {clips} clips, {size:.2f} MB")
+    return all(not counts["failed"] for counts in stats.values())
+
+if __name__ == "__main__":
+    sys.exit(0 if run_instrumented(main, "sweep") else 1)
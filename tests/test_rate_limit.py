@@ -0,0 +1,30 @@
+import threading
+
+import pytest
+
+from rate_limit import ProviderLimiter, send_with_retry
+
+class Response:
+    status_code = 200
+
+    def close(self):
+        pass
+
+def test_slot_released_after_non_retryable_error():
+    limiter = ProviderLimiter(initial_concurrency=1, max_concurrency=1)
+
+    def fail():
+        raise RuntimeError("adapter error")
+
+    for _ in range(3):
+        with pytest.raises(RuntimeError):
+            send_with_retry(fail, limiter, max_retries=0)
+    assert limiter.concurrency.in_flight == 0
+
+    # With a leaked slot this call would block forever
+    result = []
+    thread = threading.Thread(target=lambda: result.append(send_with_retry(Response, limiter)), daemon=True)
+    thread.start()
+    thread.join(5)
+    assert result and result[0].status_code == 200
+    assert limiter.concurrency.in_flight == 0
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Sentence-aware text splitter for provider character limits
+Chunks arbitrary long text at sentence, clause and whitespace boundaries,
+and synthesizes the chunks (optionally in parallel) in their original order
+"""
+
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+# Maximum characters per request for each provider
+PROVIDER_CHAR_LIMITS = {
+    "rime": 500,
+    "elevenlabs": 10000,  # eleven_multilingual_v2
+}
+
+SENTENCE_END = re.compile(r'(?<=[.!?…])["\'”’)\]]*\s+')
+CLAUSE_END = re.compile(r'(?<=[,;:—–])\s+')
+
+def _split_keep(text, pattern):
+    """Split text after each boundary match, keeping the punctuation on the left piece"""
+    pieces = []
+    start = 0
+    for match in pattern.finditer(text):
+        pieces.append(text[start:match.start()])
+        start = match.end()
+    pieces.append(text[start:])
+    return [piece.strip() for piece in pieces if piece.strip()]
+
+def _split_words(text, max_chars):
+    """Split at whitespace, hard-splitting any single word longer than max_chars"""
+    pieces = []
+    for word in text.split():
+        while len(word) > max_chars:
+            pieces.append(word[:max_chars])
+            word = word[max_chars:]
+        if word:
+            pieces.append(word)
+    return pieces
+
+def _pack(pieces, max_chars):
+    """Greedily join pieces with spaces into chunks of at most max_chars"""
+    chunks = []
+    current = ""
+    for piece in pieces:
+        candidate = f"{current} {piece}" if current else piece
+        if len(candidate) <= max_chars:
+            current = candidate
+        else:
+            if current:
+                chunks.append(current)
+            current = piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+def split_text(text, max_chars):
+    """Split text into chunks of at most max_chars, preferring sentence, then
+    clause, then whitespace boundaries"""
+    text = " ".join(text.split())
+    if len(text) <= max_chars:
+        return [text] if text else []
+
+    pieces = []
+    for sentence in _split_keep(text, SENTENCE_END):
+        if len(sentence) <= max_chars:
+            pieces.append(sentence)
+            continue
+        for clause in _split_keep(sentence, CLAUSE_END):
+            if len(clause) <= max_chars:
+                pieces.append(clause)
+            else:
+                pieces.extend(_pack(_split_words(clause, max_chars), max_chars))
+
+    return _pack(pieces, max_chars)
+
+def split_for_provider(text, provider):
+    """Split text under the given provider's request character limit"""
+    return split_text(text, PROVIDER_CHAR_LIMITS[provider])
+
+def synthesize_chunks(chunks, synthesize, concurrency=1):
+    """Call synthesize(chunk) for every chunk and return the results in chunk order"""
+    return list(iter_synthesized(chunks, synthesize, concurrency))
+
+def iter_synthesized(chunks, synthesize, concurrency=1):
+    """Yield synthesize(chunk) for every chunk in chunk order, as soon as each is ready
+
+    Up to `concurrency` chunks are in flight; chunk 1 is yielded while later
+    chunks are still being synthesized. Closing the generator early cancels
+    chunks that haven't started.
+    """
+    if concurrency <= 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            yield synthesize(chunk)
+        return
+
+    with ThreadPoolExecutor(max_workers=min(concurrency, len(chunks))) as executor:
+        yield from executor.map(synthesize, chunks)
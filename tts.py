@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Single entry point for every TTS testing tool
+Each command runs one of the scripts with the remaining arguments. Only the
+chosen script (and the provider backends it uses) is imported, so listing
+commands and --help start instantly.
+
+Usage:
+    python tts.py                                   # list commands
+    python tts.py sweep test_words.txt --voice rime=abbie rime=cove
+    python tts.py rime --incremental
+    python tts.py archive list
+"""
+
+import sys
+import argparse
+import importlib
+
+# command -> (module, description)
+COMMANDS = {
+    "rime": ("rime_full", "Synthesize the test words with RIME, batched"),
+    "rime-basic": ("rime_tts", "Synthesize the test words with the basic RIME script"),
+    "elevenlabs": ("elevenlabs_tts", "Synthesize the test words with ElevenLabs"),
+    "sentences": ("sentence_test_script", "Synthesize the test sentences with both providers"),
+    "corpus": ("corpus", "Synthesize a large corpus with bounded memory"),
+    "sweep": ("sweep", "Sweep voices, models and voice settings over a corpus"),
+    "archive": ("audio_archive", "Build and read the packed per-word audio archive"),
+    "analyze": ("audio_analysis", "Segment and compare the word-list outputs"),
+    "post-process": ("post_process", "Trim, normalize and transcode MP3 files"),
+    "benchmark": ("benchmark", "Benchmark provider latency"),
+    "fixtures": ("http_replay", "Inspect recorded HTTP fixtures"),
+    "mock-server": ("mock_tts_server", "Run the local mock RIME/ElevenLabs server"),
+}
+
+def parse_args(argv=None):
+    """Parse the command; everything after it is left for the command's own parser"""
+    parser = argparse.ArgumentParser(
+        description="TTS testing tools",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="commands:\n" + "\n".join(f"  {name:<14} {description}"
+                                         for name, (_, description) in COMMANDS.items()))
+    parser.add_argument("command", choices=COMMANDS, metavar="command")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="Options for the command (see: <command> --help)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    module_name = COMMANDS[args.command][0]
+    module = importlib.import_module(module_name)
+
+    # Scripts read their options from sys.argv, so help and errors show "tts.py <command>"
+    sys.argv = [f"tts.py {args.command}", *args.args]
+    from instrumentation import run_instrumented
+    # Every script's main() returns True on success and False on failure
+    return run_instrumented(module.main, module_name)
+
+if __name__ == "__main__":
+    if len(sys.argv) == 1:
+        parse_args(["--help"])
+    sys.exit(0 if main() else 1)
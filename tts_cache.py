@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Content-addressed on-disk audio cache shared by all TTS scripts
+Audio is keyed by a hash of provider, voice, model, settings and exact text
+"""
+
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+from instrumentation import span
+from http_replay import http_mode
+
+DEFAULT_CACHE_DIR = ".tts_cache"
+DEFAULT_MAX_BYTES = 500 * 1024 * 1024  # 500 MB
+
+def make_cache_key(provider, voice, model_id, text, settings=None):
+    """Build a stable cache key for one synthesis request"""
+    key_data = {
+        "provider": provider,
+        "voice": voice,
+        "model_id": model_id,
+        "settings": settings or {},
+        "text": text,
+    }
+    encoded = json.dumps(key_data, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+class AudioCache:
+    """On-disk audio cache with a size cap and least-recently-used eviction"""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> size, oldest first
+        self._total_bytes = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_index()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.mp3")
+
+    def _load_index(self):
+        """Rebuild the LRU order from file modification times"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".mp3"):
+                continue
+            stat = os.stat(os.path.join(self.cache_dir, name))
+            entries.append((stat.st_mtime, name[:-4], stat.st_size))
+
+        for _, key, size in sorted(entries):
+            self._entries[key] = size
+            self._total_bytes += size
+
+    def get(self, key):
+        """Return cached audio bytes for key, or None on a miss"""
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+
+            path = self._path(key)
+            try:
+                with span("cache_read") as s, open(path, 'rb') as f:
+                    audio_bytes = f.read()
+                    s.set(bytes=len(audio_bytes))
+            except FileNotFoundError:
+                # Entry was removed behind our back
+                self._total_bytes -= self._entries.pop(key)
+                self.misses += 1
+                return None
+
+            # Mark as most recently used, both in memory and on disk
+            self._entries.move_to_end(key)
+            os.utime(path)
+            self.hits += 1
+            return audio_bytes
+
+    def put(self, key, audio_bytes):
+        """Store audio bytes under key and evict old entries if over the cap"""
+        size = len(audio_bytes)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            path = self._path(key)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with span("cache_write", bytes=size), open(tmp_path, 'wb') as f:
+                f.write(audio_bytes)
+            os.replace(tmp_path, path)
+
+            if key in self._entries:
+                self._total_bytes -= self._entries.pop(key)
+            self._entries[key] = size
+            self._total_bytes += size
+
+            while self._total_bytes > self.max_bytes and self._entries:
+                old_key, old_size = self._entries.popitem(last=False)
+                self._total_bytes -= old_size
+                self.evictions += 1
+                try:
+                    os.remove(self._path(old_key))
+                except FileNotFoundError:
+                    pass
+
+    def put_file(self, key, path):
+        """Store the contents of an already written audio file under key"""
+        with open(path, 'rb') as f:
+            self.put(key, f.read())
+
+    def stats(self):
+        """Return hit/miss counters and current cache size"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+            }
+
+    def print_stats(self):
+        """Print a one-line cache summary"""
+        stats = self.stats()
+        size = stats["bytes"] / 1024 / 1024
+        print(f"🗄️ Cache: {stats['hits']} hits, {stats['misses']} misses, "
+              f"{stats['entries']} entries ({size:.2f} MB)")
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+def get_default_cache():
+    """Return the shared cache, or None if disabled via TTS_CACHE_DISABLE
+
+    The location and size cap can be set with TTS_CACHE_DIR and TTS_CACHE_MAX_MB.
+    It is also off in TTS_HTTP_MODE=record, so every request reaches the
+    network and is captured in the fixtures.
+    """
+    global _default_cache
+
+    if os.getenv('TTS_CACHE_DISABLE') or http_mode() == "record":
+        return None
+
+    with _default_cache_lock:
+        if _default_cache is None:
+            cache_dir = os.getenv('TTS_CACHE_DIR', DEFAULT_CACHE_DIR)
+            max_mb = os.getenv('TTS_CACHE_MAX_MB')
+            max_bytes = int(float(max_mb) * 1024 * 1024) if max_mb else DEFAULT_MAX_BYTES
+            _default_cache = AudioCache(cache_dir, max_bytes)
+        return _default_cache
@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+Shared HTTP client layer for the RIME.ai and ElevenLabs TTS APIs
+One long-lived pooled requests.Session per provider, plus the single place
+where request headers, payloads and cache keys are built. Every request goes
+through the provider's rate limiter and is retried on 429/5xx, and can
+optionally be hedged with a duplicate when it runs long
+"""
+
+import os
+import time
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from tts_cache import make_cache_key
+from rate_limit import ProviderLimiter, send_with_retry
+from auto_tune import get_recorder
+from hedging import Hedger
+from audio_stream import read_audio_content
+from instrumentation import span
+from http_replay import adapter_from_env, http_mode
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_MAX_RETRIES = 4
+
+RIME_API_URL = "https://users.rime.ai/v1/rime-tts"
+ELEVENLABS_API_URL = "https://api.elevenlabs.io/v1/text-to-speech"
+
+RIME_DEFAULT_SPEAKER = "abbie"        # American female voice
+RIME_DEFAULT_MODEL = "mistv2"         # Latest mistv2 model (Feb 2025)
+ELEVENLABS_DEFAULT_VOICE = "21m00Tcm4TlvDq8ikWAM"  # Rachel (American female)
+ELEVENLABS_DEFAULT_MODEL = "eleven_multilingual_v2"
+ELEVENLABS_DEFAULT_SETTINGS = {
+    "stability": 0.75,
+    "similarity_boost": 0.75,
+    "style": 0.0,
+    "use_speaker_boost": True
+}
+
+def limiter_from_env(provider, pool_size):
+    """Build a ProviderLimiter from <PROVIDER>_MAX_RPS, <PROVIDER>_MAX_CHARS_PER_MIN
+    and <PROVIDER>_MAX_CONCURRENCY (defaults: unlimited, unlimited, pool size)"""
+    prefix = provider.upper()
+    requests_per_sec = os.getenv(f'{prefix}_MAX_RPS')
+    chars_per_min = os.getenv(f'{prefix}_MAX_CHARS_PER_MIN')
+    max_concurrency = int(os.getenv(f'{prefix}_MAX_CONCURRENCY', pool_size))
+    return ProviderLimiter(
+        requests_per_sec=float(requests_per_sec) if requests_per_sec else None,
+        chars_per_min=float(chars_per_min) if chars_per_min else None,
+        initial_concurrency=min(4, max_concurrency),
+        max_concurrency=max_concurrency,
+    )
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+def get_limiter(provider, pool_size=DEFAULT_POOL_SIZE):
+    """Return the provider's shared limiter, creating it from the environment on first use
+
+    Every client of a provider (any voice, model, settings or transport)
+    draws from the same quotas and concurrency window, so a 429 on one
+    slows them all.
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(provider)
+        if limiter is None:
+            limiter = _limiters[provider] = limiter_from_env(provider, pool_size)
+        return limiter
+
+class ProviderClient:
+    """Pooled HTTP session for one provider"""
+
+    provider = None
+    # Constructor option naming the voice, so callers can pick one without knowing the provider
+    voice_option = None
+    default_voice = None
+    default_model = None
+    # Constructor option taking a dict of voice settings, if the provider has any
+    settings_option = None
+    default_settings = None
+    # True when the provider only sends headers once synthesis is done, so a
+    # streamed response can still be timed and hedged at the headers
+    answers_when_done = False
+
+    def __init__(self, api_key, url, pool_size=DEFAULT_POOL_SIZE, rate_limited=True, record_latency=True,
+                 retried=True):
+        self.api_key = api_key
+        self.url = url
+        self.pool_size = pool_size
+        # Benchmarks measure raw provider latency, so they opt out of client-side limits and
+        # retries (a retried 429 would count as one slow success) and keep their numbers out
+        # of the auto-tuner
+        self.limiter = get_limiter(self.provider, pool_size) if rate_limited else None
+        self.recorder = get_recorder() if record_latency else None
+        self.max_retries = int(os.getenv('TTS_MAX_RETRIES', DEFAULT_MAX_RETRIES)) if retried else 0
+        self.hedger = None
+        hedge_percentile = os.getenv('TTS_HEDGE_PERCENTILE')
+        if hedge_percentile:
+            self.enable_hedging(float(hedge_percentile))
+        self.session = requests.Session()
+        # TTS_HTTP_MODE=record/replay swaps in a transport that captures or serves fixtures
+        adapter = adapter_from_env(pool_size) or HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update(self.headers())
+
+    def headers(self):
+        """Headers sent with every request"""
+        raise NotImplementedError
+
+    def endpoint(self, stream=False):
+        """URL to post synthesis requests to"""
+        return self.url
+
+    def enable_hedging(self, percentile):
+        """Send a duplicate of any request still unanswered at this latency percentile
+
+        Streamed requests are only hedged for providers that answer when done.
+        """
+        if self.hedger is None or self.hedger.percentile != percentile:
+            self.hedger = Hedger(self.provider, percentile, max_workers=self.pool_size * 2)
+        return self.hedger
+
+    def post(self, payload, timeout=60, stream=False):
+        """Send a synthesis request over the pooled session, rate limited and retried"""
+        chars = len(payload.get("text", ""))
+
+        def send():
+            start = time.perf_counter()
+            with span("http_request", provider=self.provider, chars=chars, stream=stream) as s:
+                response = self.session.post(self.endpoint(stream), json=payload, timeout=timeout, stream=stream)
+                s.set(status=response.status_code)
+                if not stream:
+                    s.set(bytes=len(response.content))
+            # Streamed bodies are still in flight here, so only full responses are timed
+            if (not stream or self.answers_when_done) and response.status_code == 200:
+                latency = time.perf_counter() - start
+                if self.recorder:
+                    self.recorder.record(self.provider, chars, latency)
+                if self.hedger:
+                    self.hedger.observe(chars, latency)
+            return response
+
+        attempt = send
+        if self.hedger and (not stream or self.answers_when_done):
+            attempt = lambda: self.hedger.call(send, chars, self.limiter)
+
+        return send_with_retry(attempt, self.limiter, chars=chars, max_retries=self.max_retries)
+
+    def close(self):
+        self.session.close()
+
+class RimeClient(ProviderClient):
+    """RIME.ai client: JSON responses with base64-encoded audio"""
+
+    provider = "rime"
+    voice_option = "speaker"
+    default_voice = RIME_DEFAULT_SPEAKER
+    default_model = RIME_DEFAULT_MODEL
+    answers_when_done = True
+
+    def __init__(self, api_key, url=None, pool_size=DEFAULT_POOL_SIZE, rate_limited=True,
+                 record_latency=True, retried=True, speaker=RIME_DEFAULT_SPEAKER, model_id=RIME_DEFAULT_MODEL):
+        self.speaker = speaker
+        self.model_id = model_id
+        super().__init__(api_key, url or os.getenv('RIME_API_URL', RIME_API_URL), pool_size,
+                         rate_limited, record_latency, retried)
+
+    def headers(self):
+        return {
+            "Accept": "application/json",
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+
+    def build_payload(self, text):
+        return {
+            "speaker": self.speaker,
+            "text": text,
+            "lang": "eng",         # English language
+            "audioFormat": "mp3",  # Audio format
+            "modelId": self.model_id
+        }
+
+    def cache_key(self, payload):
+        return make_cache_key(self.provider, payload["speaker"], payload["modelId"], payload["text"],
+                              {"lang": payload["lang"], "audioFormat": payload["audioFormat"]})
+
+    def synthesize(self, payload, timeout=60):
+        """Synthesize payload and return MP3 bytes
+
+        Raises requests.HTTPError for non-200 responses and ValueError when
+        the body has no (or malformed) audioContent.
+        """
+        response = self.post(payload, timeout=timeout, stream=True)
+        if response.status_code != 200:
+            raise requests.exceptions.HTTPError(
+                f"RIME.ai API error {response.status_code}: {response.text}", response=response)
+
+        # Decode the base64 audio as the JSON body arrives
+        audio_bytes = read_audio_content(response)
+        if audio_bytes is None:
+            raise ValueError("No audioContent in response")
+        return audio_bytes
+
+class ElevenLabsClient(ProviderClient):
+    """ElevenLabs client: raw audio/mpeg responses, optionally streamed"""
+
+    provider = "elevenlabs"
+    voice_option = "voice_id"
+    default_voice = ELEVENLABS_DEFAULT_VOICE
+    default_model = ELEVENLABS_DEFAULT_MODEL
+    settings_option = "voice_settings"
+    default_settings = ELEVENLABS_DEFAULT_SETTINGS
+
+    def __init__(self, api_key, url=None, pool_size=DEFAULT_POOL_SIZE, rate_limited=True,
+                 record_latency=True, retried=True, voice_id=ELEVENLABS_DEFAULT_VOICE,
+                 model_id=ELEVENLABS_DEFAULT_MODEL, voice_settings=None):
+        self.voice_id = voice_id
+        self.model_id = model_id
+        self.voice_settings = voice_settings or dict(ELEVENLABS_DEFAULT_SETTINGS)
+        super().__init__(api_key, url or os.getenv('ELEVENLABS_API_URL', ELEVENLABS_API_URL), pool_size,
+                         rate_limited, record_latency, retried)
+
+    def headers(self):
+        return {
+            "Accept": "audio/mpeg",
+            "Content-Type": "application/json",
+            "xi-api-key": self.api_key
+        }
+
+    def endpoint(self, stream=False):
+        url = f"{self.url}/{self.voice_id}"
+        return f"{url}/stream" if stream else url
+
+    def build_payload(self, text, previous_text=None, next_text=None):
+        """Request body for text; previous_text/next_text are the surrounding text of a chunk,
+        so the voice's prosody carries across chunk boundaries"""
+        payload = {
+            "text": text,
+            "model_id": self.model_id,
+            "language_code": "en",  # Explicitly specify English
+            "voice_settings": dict(self.voice_settings)
+        }
+        if previous_text:
+            payload["previous_text"] = previous_text
+        if next_text:
+            payload["next_text"] = next_text
+        return payload
+
+    def cache_key(self, payload):
+        settings = {"language_code": payload["language_code"], "voice_settings": payload["voice_settings"]}
+        # Context changes the rendering, but keys without it stay as they were
+        for field in ("previous_text", "next_text"):
+            if field in payload:
+                settings[field] = payload[field]
+        return make_cache_key(self.provider, self.voice_id, payload["model_id"], payload["text"], settings)
+
+    def synthesize(self, payload, timeout=120):
+        """Synthesize payload and return MP3 bytes, raising requests.HTTPError for non-200 responses"""
+        response = self.post(payload, timeout=timeout)
+        if response.status_code != 200:
+            raise requests.exceptions.HTTPError(
+                f"ElevenLabs API error {response.status_code}: {response.text}", response=response)
+        return response.content
+
+    def synthesize_stream(self, payload, output_file, cache=None, timeout=120):
+        """Stream payload's audio into output_file as it arrives, returning seconds to first byte
+
+        The body goes to a temporary file that replaces output_file only once
+        it is complete (a failed stream leaves any previous output intact), and
+        is then added to cache if one is given. Raises requests.HTTPError for
+        non-200 responses.
+        """
+        start = time.perf_counter()
+        response = self.post(payload, timeout=timeout, stream=True)
+        if response.status_code != 200:
+            raise requests.exceptions.HTTPError(
+                f"ElevenLabs API error {response.status_code}: {response.text}", response=response)
+
+        first_byte = None
+        temp_file = output_file + ".tmp"
+        try:
+            with span("stream_to_file", provider=self.provider, file=output_file) as s, open(temp_file, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=8192):
+                    if not chunk:
+                        continue
+                    if first_byte is None:
+                        first_byte = time.perf_counter() - start
+                    f.write(chunk)
+                s.set(bytes=f.tell())
+        except BaseException:
+            os.remove(temp_file)
+            raise
+        finally:
+            response.close()
+        os.replace(temp_file, output_file)
+
+        if cache:
+            cache.put_file(self.cache_key(payload), output_file)
+        return first_byte
+
+CLIENT_CLASSES = {
+    "rime": RimeClient,
+    "elevenlabs": ElevenLabsClient,
+}
+
+def get_api_key(provider):
+    """<PROVIDER>_API_KEY from the environment; replayed runs don't need a real one"""
+    api_key = os.getenv(f'{provider.upper()}_API_KEY')
+    if not api_key and http_mode() == "replay":
+        return "replay"
+    return api_key
+
+def voice_options(provider, voice=None, model=None, settings=None):
+    """get_client options selecting a voice, model and/or voice settings for provider
+
+    settings are applied over the provider's default voice settings.
+    """
+    client_class = CLIENT_CLASSES[provider]
+    options = {}
+    if voice:
+        options[client_class.voice_option] = voice
+    if model:
+        options["model_id"] = model
+    if settings:
+        if client_class.settings_option is None:
+            raise ValueError(f"{provider} has no voice settings")
+        options[client_class.settings_option] = {**client_class.default_settings, **settings}
+    return options
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_client(provider, api_key, **options):
+    """Return the shared client for provider & API key, creating it on first use
+
+    The connection pool size defaults to TTS_POOL_SIZE (or 10). Clients with
+    different options (voice, model, URL...) are kept separately. Pass
+    transport="websocket" for a persistent WebSocket client (RIME only).
+    """
+    transport = options.pop("transport", "http")
+    options.setdefault("pool_size", int(os.getenv('TTS_POOL_SIZE', DEFAULT_POOL_SIZE)))
+    key = (provider, transport, api_key, tuple(sorted((k, repr(v)) for k, v in options.items())))
+
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            if transport == "websocket":
+                # Imported lazily: the WebSocket transport needs the optional websockets package
+                from rime_ws import WEBSOCKET_CLIENT_CLASSES
+                if provider not in WEBSOCKET_CLIENT_CLASSES:
+                    raise ValueError(f"No WebSocket transport for {provider}")
+                client = WEBSOCKET_CLIENT_CLASSES[provider](api_key, **options)
+            else:
+                client = CLIENT_CLASSES[provider](api_key, **options)
+            _clients[key] = client
+        return client